@@ -4,13 +4,13 @@ LLEDO 3D Pipeline — 3DXML (CATIA V5) to GLB Converter
 
 Parses Dassault Systèmes 3DXML archives containing binary V5_CFV3 (.3DRep) files,
 extracts tessellation data, reconstructs meshes with assembly transforms,
-and exports to GLB format.
+and exports to GLB format from a compact array-backed mesh pool.
 
 Usage:
   python convert_3dxml_to_glb.py --input "RL-R125-03-000 - ROLLER H125.3dxml" --output output.glb
 
 Requirements:
-  pip install numpy trimesh pygltflib
+  pip install numpy scipy
 
 For Blender PBR material + Draco compression, chain with:
   blender --background --python convert_xml_to_glb.py -- --input output_raw.glb --output output.glb
@@ -24,6 +24,8 @@ import argparse
 import xml.etree.ElementTree as ET
 import math
 import json
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 
 try:
@@ -32,12 +34,6 @@ except ImportError:
     print("[ERROR] numpy is required: pip install numpy")
     sys.exit(1)
 
-try:
-    import trimesh
-except ImportError:
-    print("[ERROR] trimesh is required: pip install trimesh")
-    sys.exit(1)
-
 
 # ─── ARGUMENT PARSING ───────────────────────────────────────────────────────────
 
@@ -46,24 +42,146 @@ def parse_args():
     parser.add_argument("--input", required=True, help="Input 3DXML file path")
     parser.add_argument("--output", required=True, help="Output GLB file path")
     parser.add_argument("--stl-dir", default=None, help="Also export individual STL files to this directory")
+    parser.add_argument("--no-index", action="store_true",
+                        help="Ignore the .idx sidecar and always re-parse the assembly XML")
+    parser.add_argument("--no-clean", action="store_true",
+                        help="Skip vertex welding, winding fix-up and smooth normals")
+    parser.add_argument("--weld", type=float, default=0.0001,
+                        help="Vertex merge distance for the cleanup stage (default: 0.0001)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for the cleanup stage")
     parser.add_argument("--debug", action="store_true", help="Enable debug output")
     return parser.parse_args()
 
 
 # ─── 3DXML ARCHIVE PARSER ───────────────────────────────────────────────────────
 
+INDEX_MAGIC = b'L3DXIDX2'
+INDEX_HEADER = struct.Struct('<8sqqI')   # magic, mtime_ns, size, matrix count
+
+
 class Assembly3DXML:
-    """Parse 3DXML archive structure."""
+    """Parse 3DXML archive structure.
+
+    The parsed structure is cached in a sidecar file (``<archive>.idx``) holding
+    the assembly dictionaries, the resolved scene parts, the instance matrices
+    (float64, as parsed) and the zip offsets of every archive member. The
+    sidecar is only trusted while the archive's mtime and size match, so
+    reopening an unchanged archive skips the XML parse and the assembly walk.
+    """
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, use_index=True):
         self.filepath = filepath
-        self.zip = zipfile.ZipFile(filepath)
+        self.index_path = filepath + '.idx'
+        self._zip = None
+        self.members = {}         # name -> (header_offset, compress_size, file_size, compress_type)
         self.references = {}      # id -> {name, desc, version, rep_file}
         self.instances = {}       # id -> {name, parent_id, ref_id, matrix}
         self.rep_refs = {}        # id -> {name, file}
         self.instance_reps = {}   # id -> {ref3d_id, rep_id}
         self.root_id = None
+        self.parts = None         # resolved build_scene_parts() result
+        self._rep_files = None    # ref3d id -> 3DRep filename
+
+        if use_index and self._load_index():
+            print(f"[INFO] Assembly (index): {len(self.references)} references, "
+                  f"{len(self.instances)} instances, "
+                  f"{len(self.rep_refs)} rep refs")
+            return
+
         self._parse_assembly()
+        self.members = {
+            info.filename: (info.header_offset, info.compress_size, info.file_size, info.compress_type)
+            for info in self.zip.infolist()
+        }
+        if use_index:
+            self.parts = self._resolve_parts()
+            self._save_index()
+
+    @property
+    def zip(self):
+        """Open the archive lazily — an index hit never needs the central directory."""
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.filepath)
+        return self._zip
+
+    # ─── Sidecar index ──────────────────────────────────────────────────────
+
+    def _archive_stamp(self):
+        st = os.stat(self.filepath)
+        return st.st_mtime_ns, st.st_size
+
+    def _save_index(self):
+        """Write the parsed structure and resolved parts to the .idx sidecar."""
+        mtime_ns, size = self._archive_stamp()
+
+        matrices = []
+        instances = {}
+        for iid, inst in self.instances.items():
+            entry = {k: v for k, v in inst.items() if k != 'matrix'}
+            if 'matrix' in inst:
+                entry['m'] = len(matrices)
+                matrices.append(inst['matrix'])
+            instances[iid] = entry
+        parts = []
+        for part in self.parts:
+            entry = {k: v for k, v in part.items() if k != 'transform'}
+            entry['m'] = len(matrices)
+            matrices.append(part['transform'])
+            parts.append(entry)
+
+        meta = {
+            'root_id': self.root_id,
+            'references': self.references,
+            'instances': instances,
+            'rep_refs': self.rep_refs,
+            'instance_reps': self.instance_reps,
+            'members': self.members,
+            'parts': parts,
+        }
+        payload = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+        mat_bytes = np.asarray(matrices, dtype='<f8').reshape(-1, 16).tobytes()
+
+        try:
+            with open(self.index_path, 'wb') as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, mtime_ns, size, len(matrices)))
+                f.write(zlib.compress(mat_bytes + payload))
+        except OSError as e:
+            print(f"[WARN] Could not write index {self.index_path}: {e}")
+
+    def _load_index(self):
+        """Load the .idx sidecar. Returns False if missing, stale or unreadable."""
+        try:
+            with open(self.index_path, 'rb') as f:
+                header = f.read(INDEX_HEADER.size)
+                body = f.read()
+            magic, mtime_ns, size, n_matrices = INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC or (mtime_ns, size) != self._archive_stamp():
+                return False
+
+            body = zlib.decompress(body)
+            mat_len = n_matrices * 16 * 8
+            matrices = np.frombuffer(body[:mat_len], dtype='<f8').reshape(-1, 4, 4)
+            meta = json.loads(body[mat_len:].decode('utf-8'))
+        except (OSError, struct.error, zlib.error, ValueError):
+            return False
+
+        self.root_id = meta['root_id']
+        self.references = meta['references']
+        self.rep_refs = meta['rep_refs']
+        self.instance_reps = meta['instance_reps']
+        self.members = {name: tuple(v) for name, v in meta['members'].items()}
+        self.instances = {}
+        for iid, inst in meta['instances'].items():
+            m = inst.pop('m', None)
+            if m is not None:
+                inst['matrix'] = matrices[m].copy()
+            self.instances[iid] = inst
+        self.parts = []
+        for part in meta['parts']:
+            part['transform'] = matrices[part.pop('m')].copy()
+            self.parts.append(part)
+        return True
 
     def _parse_assembly(self):
         """Parse the main assembly XML file."""
@@ -183,12 +301,14 @@ class Assembly3DXML:
 
     def get_rep_file(self, ref3d_id):
         """Get the 3DRep filename for a Reference3D id."""
-        for irep in self.instance_reps.values():
-            if irep.get('ref3d_id') == ref3d_id:
+        if self._rep_files is None:
+            self._rep_files = {}
+            for irep in self.instance_reps.values():
                 rep_id = irep.get('rep_id')
-                if rep_id in self.rep_refs:
-                    return self.rep_refs[rep_id]['file']
-        return None
+                ref3d = irep.get('ref3d_id')
+                if rep_id in self.rep_refs and ref3d not in self._rep_files:
+                    self._rep_files[ref3d] = self.rep_refs[rep_id]['file']
+        return self._rep_files.get(ref3d_id)
 
     def get_world_transform(self, instance_id):
         """Compute world transform by walking up the instance tree."""
@@ -219,6 +339,12 @@ class Assembly3DXML:
 
     def build_scene_parts(self):
         """Build list of (name, rep_file, world_transform) for all parts."""
+        if self.parts is None:
+            self.parts = self._resolve_parts()
+        print(f"[INFO] Scene parts with geometry: {len(self.parts)}")
+        return self.parts
+
+    def _resolve_parts(self):
         parts = []
 
         for inst_id, inst in self.instances.items():
@@ -246,16 +372,38 @@ class Assembly3DXML:
                 'ref_id': ref_id,
             })
 
-        print(f"[INFO] Scene parts with geometry: {len(parts)}")
         return parts
 
     def read_3drep(self, filename):
         """Read a 3DRep file from the archive."""
+        member = self.members.get(filename)
+        if member is not None and member[3] in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            try:
+                data = self._read_member_at(*member)
+            except (OSError, zlib.error, struct.error):
+                data = None
+            if data is not None:
+                return data
+            # Stale offset: go through the central directory instead
         try:
             return self.zip.read(filename)
         except KeyError:
             return None
 
+    def _read_member_at(self, header_offset, compress_size, file_size, compress_type):
+        """Read a member straight from its local header offset, bypassing ZipFile."""
+        with open(self.filepath, 'rb') as f:
+            f.seek(header_offset)
+            local = f.read(30)
+            if local[:4] != b'PK\x03\x04':
+                return None
+            name_len, extra_len = struct.unpack_from('<HH', local, 26)
+            f.seek(name_len + extra_len, os.SEEK_CUR)
+            raw = f.read(compress_size)
+        if compress_type == zipfile.ZIP_DEFLATED:
+            raw = zlib.decompress(raw, -15)
+        return raw if len(raw) == file_size else None
+
 
 # ─── V5_CFV3 BINARY TESSELLATION EXTRACTOR ───────────────────────────────────────
 
@@ -422,12 +570,323 @@ class CGRTessellationExtractor:
         return np.array(faces, dtype=np.int32)
 
 
+# ─── MESH POOL ───────────────────────────────────────────────────────────────────
+
+class MeshPool:
+    """Array-backed container for every part mesh of an assembly.
+
+    All parts share three contiguous buffers — float32 positions, uint16/uint32
+    part-local triangle indices and float32 4x4 transforms — addressed through
+    prefix-sum offset tables. A part costs one slot in each table instead of a
+    dict of arrays or a Trimesh object with its caches. Optional float32 vertex
+    normals are stored alongside the positions once every part has them.
+    """
+
+    __slots__ = ('positions', 'normals', 'indices', 'transforms', 'vert_offsets', 'face_offsets',
+                 'names', 'blocks', '_pending')
+
+    def __init__(self):
+        self.positions = np.empty((0, 3), dtype=np.float32)
+        self.normals = None
+        self.indices = np.empty((0, 3), dtype=np.uint16)
+        self.transforms = np.empty((0, 4, 4), dtype=np.float32)
+        self.vert_offsets = np.zeros(1, dtype=np.int64)
+        self.face_offsets = np.zeros(1, dtype=np.int64)
+        self.names = []
+        self.blocks = np.empty(0, dtype=np.int16)   # mesh block index, -1 for single-block parts
+        self._pending = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, vertices, faces, transform=None, block=-1, normals=None):
+        """Queue a part. Unreferenced vertices are dropped. Returns False if empty."""
+        faces = np.asarray(faces).reshape(-1, 3)
+        if len(faces) == 0:
+            return False
+        used, local = np.unique(faces, return_inverse=True)
+        verts = np.asarray(vertices, dtype=np.float32)[used]
+        if normals is not None:
+            normals = np.asarray(normals, dtype=np.float32)[used]
+        if transform is None:
+            transform = np.eye(4)
+        self._pending.append((name, block, verts, local.reshape(-1, 3), transform, normals))
+        return True
+
+    def pack(self):
+        """Concatenate queued parts into the contiguous buffers."""
+        if not self._pending:
+            return self
+        names, blocks, verts, faces, transforms, normals = zip(*self._pending)
+        self._pending = []
+
+        has_normals = all(n is not None for n in normals) and (self.normals is not None or not self.names)
+        self.normals = np.concatenate([self.normals if self.normals is not None
+                                       else np.empty((0, 3), dtype=np.float32), *normals]) if has_normals else None
+
+        n_verts = np.array([len(v) for v in verts], dtype=np.int64)
+        n_faces = np.array([len(f) for f in faces], dtype=np.int64)
+        max_local = max(int(n_verts.max()), int(np.diff(self.vert_offsets).max(initial=0)))
+        index_dtype = np.uint16 if max_local <= 0xFFFF else np.uint32
+
+        self.positions = np.concatenate([self.positions, *verts])
+        self.indices = np.concatenate([self.indices.astype(index_dtype),
+                                       *(f.astype(index_dtype) for f in faces)])
+        self.transforms = np.concatenate([self.transforms, np.asarray(transforms, dtype=np.float32)])
+        self.vert_offsets = np.concatenate([self.vert_offsets, self.vert_offsets[-1] + np.cumsum(n_verts)])
+        self.face_offsets = np.concatenate([self.face_offsets, self.face_offsets[-1] + np.cumsum(n_faces)])
+        self.names.extend(names)
+        self.blocks = np.concatenate([self.blocks, np.asarray(blocks, dtype=np.int16)])
+        return self
+
+    def part(self, i):
+        """Return (positions, indices) views of part i."""
+        v0, v1 = self.vert_offsets[i], self.vert_offsets[i + 1]
+        f0, f1 = self.face_offsets[i], self.face_offsets[i + 1]
+        return self.positions[v0:v1], self.indices[f0:f1]
+
+    def part_of_vertex(self):
+        """Part index of every vertex in the pool."""
+        return np.repeat(np.arange(len(self)), np.diff(self.vert_offsets))
+
+    def apply_transforms(self):
+        """Bake every part transform into the positions with one batched multiply."""
+        pv = self.part_of_vertex()
+        rot = self.transforms[:, :3, :3]
+        trans = self.transforms[:, :3, 3]
+        self.positions = np.einsum('vij,vj->vi', rot[pv], self.positions) + trans[pv]
+        if self.normals is not None:
+            normal_mat = np.linalg.inv(rot).transpose(0, 2, 1)
+            normals = np.einsum('vij,vj->vi', normal_mat[pv], self.normals)
+            self.normals = normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+        self.transforms[:] = np.eye(4, dtype=np.float32)
+        return self
+
+
+# ─── GEOMETRY CLEANUP ────────────────────────────────────────────────────────────
+# NumPy counterpart of clean_geometry() in convert_xml_to_glb.py: merge by
+# distance, consistent outward winding and smooth shading, without Blender.
+
+def _rank(sorted_values, values):
+    """Index of each value in a sorted unique array, -1 if absent or negative."""
+    if len(sorted_values) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_values, values), len(sorted_values) - 1)
+    return np.where((sorted_values[pos] == values) & (values >= 0), pos, -1)
+
+
+class _CellIndex:
+    """Exact integer keys of grid cells and of their neighbours, from per-axis ranks.
+
+    A key is (rank of the (x, y) pair) * (number of z values) + rank of z,
+    so it stays below n**2 without hash collisions; a neighbour that no
+    vertex occupies on some axis gets -1.
+    """
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.axes = [np.unique(cells[:, k]) for k in range(3)]
+        self.ranks = [np.searchsorted(axis, cells[:, k]) for k, axis in enumerate(self.axes)]
+        self.xy = np.unique(self.ranks[0] * len(self.axes[1]) + self.ranks[1])
+
+    def _shift(self, rows, k, d):
+        """Rank of coordinate + d on axis k, -1 where no cell has that coordinate."""
+        r = self.ranks[k][rows] + d
+        if d == 0:
+            return r
+        axis = self.axes[k]
+        ok = (r >= 0) & (r < len(axis))
+        ok[ok] = axis[r[ok]] == self.cells[rows[ok], k] + d
+        return np.where(ok, r, -1)
+
+    def keys(self, rows, offset=(0, 0, 0)):
+        """Key of the cell at ``offset`` from each of ``rows``."""
+        rx, ry, rz = (self._shift(rows, k, d) for k, d in enumerate(offset))
+        rxy = _rank(self.xy, np.where((rx >= 0) & (ry >= 0), rx * len(self.axes[1]) + ry, -1))
+        return np.where((rxy >= 0) & (rz >= 0), rxy * len(self.axes[2]) + rz, -1)
+
+
+def weld_vertices(vertices, faces, distance=0.0001):
+    """Merge vertices closer than ``distance`` (merge by distance).
+
+    Vertices are sorted once by grid cell of size ``distance``; each
+    occupied cell is compared with itself and the 13 neighbouring cells that
+    follow it, so every pair of cells is visited once. Pairs truly within
+    ``distance`` are merged transitively. Faces collapsed by the merge are
+    dropped. Returns (vertices, faces).
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    # Exact duplicates (split CAD vertices) first: shrinks the neighbour search
+    rows = np.ascontiguousarray(vertices).view(np.dtype((np.void, vertices.dtype.itemsize * 3)))
+    _, first_exact, exact = np.unique(rows.reshape(-1), return_index=True, return_inverse=True)
+    points = vertices[first_exact]
+
+    n = len(points)
+    index = _CellIndex(np.floor(points / distance).astype(np.int64))
+    point_keys = index.keys(np.arange(n))
+    order = np.argsort(point_keys, kind='stable')
+    cell_keys, run_start, run_count = np.unique(point_keys[order], return_index=True,
+                                                return_counts=True)
+    run_rows = order[run_start]
+    m = len(cell_keys)
+
+    # Candidate cell pairs: each cell with itself and its forward neighbours
+    cell_i, cell_j = [np.arange(m)], [np.arange(m)]
+    for off in ((dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)):
+        if off <= (0, 0, 0):
+            continue
+        j = _rank(cell_keys, index.keys(run_rows, off))
+        found = j >= 0
+        cell_i.append(np.flatnonzero(found))
+        cell_j.append(j[found])
+    cell_i, cell_j = np.concatenate(cell_i), np.concatenate(cell_j)
+
+    # Expand every cell pair to the point pairs of the two runs
+    size = run_count[cell_i] * run_count[cell_j]
+    pair = np.repeat(np.arange(len(cell_i)), size)
+    t = np.arange(int(size.sum())) - np.repeat(np.cumsum(size) - size, size)
+    width = run_count[cell_j][pair]
+    i = order[run_start[cell_i][pair] + t // width]
+    j = order[run_start[cell_j][pair] + t % width]
+    close = ((cell_i[pair] != cell_j[pair]) | (i < j)) & \
+        (np.linalg.norm(points[i] - points[j], axis=1) <= distance)
+    pair_i, pair_j = i[close], j[close]
+
+    graph = coo_matrix((np.ones(len(pair_i), dtype=np.int8), (pair_i, pair_j)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    labels = labels[exact.reshape(-1)]
+
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    faces = inverse.reshape(-1)[faces]
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    return vertices[first], faces[keep]
+
+
+def orient_faces(vertices, faces):
+    """Make winding consistent across each connected patch, then point it outward.
+
+    Faces sharing a manifold edge must traverse it in opposite directions;
+    a breadth-first walk over the face adjacency propagates the required
+    flips. Each patch is then flipped if its signed volume is negative.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import breadth_first_order, connected_components
+
+    n_faces = len(faces)
+    if n_faces == 0:
+        return faces
+
+    he_from = faces.reshape(-1)
+    he_to = faces[:, [1, 2, 0]].reshape(-1)
+    he_face = np.repeat(np.arange(n_faces), 3)
+
+    # Pair up the half-edges of every edge used by exactly two faces
+    lo, hi = np.minimum(he_from, he_to), np.maximum(he_from, he_to)
+    order = np.lexsort((hi, lo))
+    lo, hi = lo[order], hi[order]
+    starts = np.flatnonzero(np.r_[True, (lo[1:] != lo[:-1]) | (hi[1:] != hi[:-1])])
+    counts = np.diff(np.r_[starts, len(order)])
+    pairs = starts[counts == 2]
+    a, b = order[pairs], order[pairs + 1]
+
+    # Edge weight: 1 = consistent neighbour, 2 = needs a relative flip
+    weight = np.where(he_from[a] == he_from[b], 2, 1)
+    fa, fb = he_face[a], he_face[b]
+
+    # Faces sharing several edges (slivers, duplicates) must not have their
+    # weights summed by the sparse matrix: keep one pair, flip on a majority
+    lo_f, hi_f = np.minimum(fa, fb), np.maximum(fa, fb)
+    pair_keys, pair_idx = np.unique(lo_f * n_faces + hi_f, return_inverse=True)
+    votes = np.bincount(pair_idx.reshape(-1), weights=np.where(weight == 2, 1, -1))
+    fa, fb = pair_keys // n_faces, pair_keys % n_faces
+    weight = np.where(votes > 0, 2, 1)
+    graph = coo_matrix((weight, (fa, fb)), shape=(n_faces, n_faces)).tocsr()
+    n_patches, labels = connected_components(graph, directed=False)
+
+    # Virtual root linked to one face per patch gives a single BFS
+    roots = np.unique(labels, return_index=True)[1]
+    graph = coo_matrix((np.r_[weight, np.ones(len(roots), dtype=weight.dtype)],
+                        (np.r_[fa, np.full(len(roots), n_faces)], np.r_[fb, roots])),
+                       shape=(n_faces + 1, n_faces + 1)).tocsr()
+    graph = graph.maximum(graph.T)
+    bfs, pred = breadth_first_order(graph, n_faces, directed=False, return_predecessors=True)
+    bfs = bfs[1:]
+
+    # A face's flip is the parity of relative flips on its path to the root:
+    # pointer jumping doubles the path covered by each step
+    flip = np.zeros(n_faces + 1, dtype=bool)
+    flip[bfs] = np.asarray(graph[bfs, pred[bfs]]).reshape(-1) == 2
+    up = pred.copy()
+    up[n_faces] = n_faces
+    while np.any(up != n_faces):
+        flip ^= flip[up]
+        up = up[up]
+    flip = flip[:n_faces]
+
+    faces = faces.copy()
+    faces[flip] = faces[flip][:, [0, 2, 1]]
+
+    # Outward: positive signed volume per patch
+    tri = vertices[faces].astype(np.float64)
+    signed = np.einsum('ij,ij->i', tri[:, 0], np.cross(tri[:, 1], tri[:, 2]))
+    inward = np.bincount(labels, weights=signed, minlength=n_patches) < 0
+    flip = inward[labels]
+    faces[flip] = faces[flip][:, [0, 2, 1]]
+    return faces
+
+
+def vertex_normals(vertices, faces):
+    """Area-weighted smooth vertex normals."""
+    tri = vertices[faces].astype(np.float64)
+    face_n = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    idx = faces.reshape(-1)
+    normals = np.stack([np.bincount(idx, weights=np.repeat(face_n[:, k], 3), minlength=len(vertices))
+                        for k in range(3)], axis=1)
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return (normals / np.maximum(lengths, 1e-12)).astype(np.float32)
+
+
+def clean_part(vertices, faces, distance=0.0001):
+    """Weld, orient and smooth-shade one part. Returns (vertices, faces, normals)."""
+    vertices, faces = weld_vertices(vertices, faces.astype(np.int64), distance)
+    faces = orient_faces(vertices, faces)
+    return vertices, faces, vertex_normals(vertices, faces)
+
+
+def _clean_part_job(job):
+    return clean_part(*job)
+
+
+def clean_pool(pool, distance=0.0001, jobs=1):
+    """Run clean_part over every part of a world-space pool, in parallel.
+
+    Returns a new packed MeshPool carrying vertex normals.
+    """
+    work = [(*pool.part(i), distance) for i in range(len(pool))]
+    if jobs > 1 and len(work) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_clean_part_job, work, chunksize=max(1, len(work) // (jobs * 4))))
+    else:
+        results = [_clean_part_job(job) for job in work]
+
+    cleaned = MeshPool()
+    for i, (vertices, faces, normals) in enumerate(results):
+        cleaned.add(pool.names[i], vertices, faces, block=int(pool.blocks[i]), normals=normals)
+    return cleaned.pack()
+
+
 # ─── MESH BUILDER ────────────────────────────────────────────────────────────────
 
-def build_scene_mesh(assembly, extractor, debug=False):
-    """Build a combined trimesh Scene from the 3DXML assembly."""
+def build_scene_mesh(assembly, extractor, debug=False, clean=True, weld_distance=0.0001, jobs=1):
+    """Build a MeshPool with world-space positions from the 3DXML assembly.
+
+    With ``clean``, every part goes through clean_part() (weld, winding,
+    smooth normals) on ``jobs`` processes.
+    """
     parts = assembly.build_scene_parts()
-    scene = trimesh.Scene()
+    pool = MeshPool()
     stats = {'loaded': 0, 'failed': 0, 'empty': 0, 'total_verts': 0, 'total_faces': 0}
 
     # Track which rep files we've already processed (avoid duplicates)
@@ -454,41 +913,29 @@ def build_scene_mesh(assembly, extractor, debug=False):
             stats['empty'] += 1
             continue
 
-        # Combine all mesh blocks for this part
         for idx, mesh_data in enumerate(meshes):
             try:
-                mesh = trimesh.Trimesh(
-                    vertices=mesh_data['vertices'],
-                    faces=mesh_data['faces'],
-                    process=True,
-                )
-
-                if mesh.is_empty:
-                    continue
-
-                # Apply part transform
-                mesh.apply_transform(part['transform'])
-
-                # Set material color (aluminium)
-                mesh.visual = trimesh.visual.ColorVisuals(
-                    mesh=mesh,
-                    face_colors=np.tile([196, 199, 199, 255], (len(mesh.faces), 1))
-                )
-
-                name = f"{part['name']}_{idx}" if len(meshes) > 1 else part['name']
-                # Clean name for scene graph
-                name = name.replace(' ', '_').replace('-', '_')[:60]
-                scene.add_geometry(mesh, node_name=name)
-
-                stats['loaded'] += 1
-                stats['total_verts'] += len(mesh.vertices)
-                stats['total_faces'] += len(mesh.faces)
-
+                block = idx if len(meshes) > 1 else -1
+                if pool.add(part['name'], mesh_data['vertices'], mesh_data['faces'],
+                            part['transform'], block=block):
+                    stats['loaded'] += 1
             except Exception as e:
                 if debug:
                     print(f"  [ERROR] {part['name']}: {e}")
                 stats['failed'] += 1
 
+    pool.pack()
+    pool.apply_transforms()
+
+    if clean and len(pool):
+        before = len(pool.positions)
+        pool = clean_pool(pool, weld_distance, jobs)
+        print(f"[INFO] Cleanup: welded {before - len(pool.positions):,} vertices, "
+              f"normals and winding fixed on {len(pool)} part(s)")
+
+    stats['total_verts'] = len(pool.positions)
+    stats['total_faces'] = len(pool.indices)
+
     print(f"\n[INFO] Scene build complete:")
     print(f"  Loaded:  {stats['loaded']} mesh(es)")
     print(f"  Failed:  {stats['failed']}")
@@ -496,59 +943,135 @@ def build_scene_mesh(assembly, extractor, debug=False):
     print(f"  Vertices: {stats['total_verts']:,}")
     print(f"  Faces:    {stats['total_faces']:,}")
 
-    return scene, stats
+    return pool, stats
 
 
 # ─── EXPORT ──────────────────────────────────────────────────────────────────────
 
-def export_glb(scene, output_path):
-    """Export trimesh scene to GLB."""
+ALUMINIUM_RGBA = [196 / 255, 199 / 255, 199 / 255, 1.0]
+
+
+def _node_name(pool, i):
+    name = pool.names[i]
+    if pool.blocks[i] >= 0:
+        name = f"{name}_{pool.blocks[i]}"
+    # Clean name for scene graph
+    return name.replace(' ', '_').replace('-', '_')[:60]
+
+
+def export_glb(pool, output_path):
+    """Write the pool to GLB: one shared buffer, one accessor pair per part."""
     os.makedirs(os.path.dirname(os.path.abspath(output_path)) or '.', exist_ok=True)
 
-    # Export as GLB
-    glb_data = scene.export(file_type='glb')
+    positions = np.ascontiguousarray(pool.positions, dtype='<f4')
+    indices = np.ascontiguousarray(pool.indices)
+    index_size = indices.dtype.itemsize
+    pos_bytes = positions.tobytes()
+    idx_bytes = indices.tobytes()
+    nor_bytes = b''
+    if pool.normals is not None:
+        nor_bytes = np.ascontiguousarray(pool.normals, dtype='<f4').tobytes()
+    per_part = 3 if nor_bytes else 2
+
+    starts = pool.vert_offsets[:-1]
+    mins = np.minimum.reduceat(positions, starts, axis=0)
+    maxs = np.maximum.reduceat(positions, starts, axis=0)
+
+    accessors, meshes, nodes = [], [], []
+    for i in range(len(pool)):
+        n_verts = int(pool.vert_offsets[i + 1] - pool.vert_offsets[i])
+        n_faces = int(pool.face_offsets[i + 1] - pool.face_offsets[i])
+        accessors.append({
+            'bufferView': 0, 'byteOffset': int(pool.vert_offsets[i]) * 12,
+            'componentType': 5126, 'count': n_verts, 'type': 'VEC3',
+            'min': mins[i].tolist(), 'max': maxs[i].tolist(),
+        })
+        accessors.append({
+            'bufferView': 1, 'byteOffset': int(pool.face_offsets[i]) * 3 * index_size,
+            'componentType': 5123 if index_size == 2 else 5125,
+            'count': n_faces * 3, 'type': 'SCALAR',
+        })
+        attributes = {'POSITION': per_part * i}
+        if nor_bytes:
+            accessors.append({
+                'bufferView': 2, 'byteOffset': int(pool.vert_offsets[i]) * 12,
+                'componentType': 5126, 'count': n_verts, 'type': 'VEC3',
+            })
+            attributes['NORMAL'] = per_part * i + 2
+        name = _node_name(pool, i)
+        meshes.append({'name': name, 'primitives': [{'attributes': attributes,
+                                                     'indices': per_part * i + 1, 'material': 0}]})
+        nodes.append({'name': name, 'mesh': i})
+
+    idx_offset = len(pos_bytes)
+    binary = pos_bytes + idx_bytes
+    binary += b'\x00' * (-len(binary) % 4)
+    nor_offset = len(binary)
+    binary += nor_bytes
+
+    gltf = {
+        'asset': {'version': '2.0', 'generator': 'LLEDO 3D Pipeline'},
+        'scene': 0,
+        'scenes': [{'nodes': list(range(len(nodes)))}],
+        'nodes': nodes,
+        'meshes': meshes,
+        'materials': [{'name': 'Aluminium', 'pbrMetallicRoughness': {
+            'baseColorFactor': ALUMINIUM_RGBA, 'metallicFactor': 1.0, 'roughnessFactor': 0.3}}],
+        'accessors': accessors,
+        'bufferViews': [
+            {'buffer': 0, 'byteOffset': 0, 'byteLength': len(pos_bytes), 'target': 34962},
+            {'buffer': 0, 'byteOffset': idx_offset, 'byteLength': len(idx_bytes), 'target': 34963},
+        ] + ([{'buffer': 0, 'byteOffset': nor_offset, 'byteLength': len(nor_bytes), 'target': 34962}]
+             if nor_bytes else []),
+        'buffers': [{'byteLength': len(binary)}],
+    }
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode('utf-8')
+    json_chunk += b' ' * (-len(json_chunk) % 4)
 
     with open(output_path, 'wb') as f:
-        f.write(glb_data)
+        f.write(struct.pack('<4sII', b'glTF', 2, 12 + 8 + len(json_chunk) + 8 + len(binary)))
+        f.write(struct.pack('<I4s', len(json_chunk), b'JSON'))
+        f.write(json_chunk)
+        f.write(struct.pack('<I4s', len(binary), b'BIN\x00'))
+        f.write(binary)
 
     size_mb = os.path.getsize(output_path) / (1024 * 1024)
     print(f"[OK] Exported GLB: {output_path} ({size_mb:.2f} MB)")
 
 
-def export_stl_parts(assembly, extractor, stl_dir, debug=False):
-    """Export each part as individual STL file."""
-    os.makedirs(stl_dir, exist_ok=True)
-    parts = assembly.build_scene_parts()
+def write_binary_stl(path, vertices, faces):
+    """Write a binary STL straight from vertex/index arrays."""
+    tris = vertices[faces.astype(np.int64)].astype(np.float32)
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
 
-    for part in parts:
-        data = assembly.read_3drep(part['file'])
-        if data is None:
-            continue
+    records = np.zeros(len(tris), dtype=[('normal', '<f4', 3), ('verts', '<f4', (3, 3)), ('attr', '<u2')])
+    records['normal'] = normals
+    records['verts'] = tris
 
-        meshes = extractor.extract(data)
-        if not meshes:
-            continue
+    with open(path, 'wb') as f:
+        f.write(b'LLEDO 3D Pipeline'.ljust(80, b'\x00'))
+        f.write(struct.pack('<I', len(records)))
+        f.write(records.tobytes())
 
-        for idx, mesh_data in enumerate(meshes):
-            try:
-                mesh = trimesh.Trimesh(
-                    vertices=mesh_data['vertices'],
-                    faces=mesh_data['faces'],
-                    process=True,
-                )
-                if mesh.is_empty:
-                    continue
-
-                mesh.apply_transform(part['transform'])
-                name = part['name'].replace(' ', '_').replace('/', '_')[:50]
-                stl_path = os.path.join(stl_dir, f"{name}_{idx}.stl")
-                mesh.export(stl_path, file_type='stl')
 
-                if debug:
-                    print(f"  [STL] {stl_path}")
-            except Exception as e:
-                if debug:
-                    print(f"  [ERROR] STL export {part['name']}: {e}")
+def export_stl_parts(pool, stl_dir, debug=False):
+    """Export each part as individual STL file."""
+    os.makedirs(stl_dir, exist_ok=True)
+
+    for i in range(len(pool)):
+        try:
+            vertices, faces = pool.part(i)
+            name = pool.names[i].replace(' ', '_').replace('/', '_')[:50]
+            stl_path = os.path.join(stl_dir, f"{name}_{max(int(pool.blocks[i]), 0)}.stl")
+            write_binary_stl(stl_path, vertices, faces)
+
+            if debug:
+                print(f"  [STL] {stl_path}")
+        except Exception as e:
+            if debug:
+                print(f"  [ERROR] STL export {pool.names[i]}: {e}")
 
 
 # ─── MAIN ────────────────────────────────────────────────────────────────────────
@@ -568,11 +1091,12 @@ def main():
         print(f"[ERROR] File not found: {args.input}")
         sys.exit(1)
 
-    assembly = Assembly3DXML(args.input)
+    assembly = Assembly3DXML(args.input, use_index=not args.no_index)
     extractor = CGRTessellationExtractor(debug=args.debug)
 
     # 2. Build scene
-    scene, stats = build_scene_mesh(assembly, extractor, debug=args.debug)
+    pool, stats = build_scene_mesh(assembly, extractor, debug=args.debug,
+                                   clean=not args.no_clean, weld_distance=args.weld, jobs=args.jobs)
 
     if stats['loaded'] == 0:
         print("\n[WARN] No meshes could be extracted from binary 3DRep files.")
@@ -586,12 +1110,12 @@ def main():
         sys.exit(1)
 
     # 3. Export GLB
-    export_glb(scene, args.output)
+    export_glb(pool, args.output)
 
     # 4. Optional: Export individual STL parts
     if args.stl_dir:
         print(f"\n[INFO] Exporting individual STL files to: {args.stl_dir}")
-        export_stl_parts(assembly, extractor, args.stl_dir, debug=args.debug)
+        export_stl_parts(pool, args.stl_dir, debug=args.debug)
 
     print("\n[DONE] Pipeline complete.")
     print(f"\n  Next step (optional): Apply PBR material with Blender:")
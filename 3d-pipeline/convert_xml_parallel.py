@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+LLEDO 3D Pipeline — Parallel XML to GLB Converter (Blender driver)
+
+Splits a COLLADA assembly into groups of top-level subassemblies, converts
+each group in its own headless Blender (same cleanup and material settings as
+convert_xml_to_glb.py, without Draco), then merges the partial GLBs in one
+last Blender pass that shares a single material and applies Draco.
+
+Usage:
+  python convert_xml_parallel.py --input assemblage.dae --output output.glb --workers 8
+
+Inputs that cannot be split (X3D, a single top-level node) fall back to a
+single Blender run. Runs with plain Python; only the workers need Blender.
+"""
+
+import argparse
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BLENDER_SCRIPT = os.path.join(SCRIPT_DIR, "convert_xml_to_glb.py")
+
+
+# ─── ARGUMENT PARSING ───────────────────────────────────────────────────────────
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert a COLLADA assembly to GLB with parallel Blender workers")
+    parser.add_argument("--input", required=True, help="Input DAE/XML file path")
+    parser.add_argument("--output", required=True, help="Output GLB file path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of Blender workers")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"), help="Blender executable")
+    parser.add_argument("--metallic", type=float, default=1.0, help="Metallic value (0-1)")
+    parser.add_argument("--roughness", type=float, default=0.3, help="Roughness value (0-1)")
+    parser.add_argument("--no-draco", dest="draco", action="store_false", help="Disable Draco on the merged GLB")
+    parser.add_argument("--keep-temp", action="store_true", help="Keep partial DAE/GLB files")
+    return parser.parse_args()
+
+
+# ─── COLLADA SPLITTING ──────────────────────────────────────────────────────────
+
+def _local(tag):
+    return tag.split('}')[-1] if '}' in tag else tag
+
+
+def _url_id(url):
+    return url[1:] if url and url.startswith('#') else url
+
+
+def _find_visual_scene(root, ns):
+    """Return the visual_scene referenced by <scene>, or the first one."""
+    lib = root.find(f'{ns}library_visual_scenes')
+    if lib is None:
+        return None
+    scenes = lib.findall(f'{ns}visual_scene')
+    inst = root.find(f'{ns}scene/{ns}instance_visual_scene')
+    if inst is not None:
+        wanted = _url_id(inst.get('url'))
+        for vs in scenes:
+            if vs.get('id') == wanted:
+                return vs
+    return scenes[0] if scenes else None
+
+
+def _referenced_geometries(node, library_nodes, seen=None):
+    """Geometry ids instanced under a node, following <instance_node> links."""
+    seen = set() if seen is None else seen
+    ids = []
+    for el in node.iter():
+        tag = _local(el.tag)
+        if tag == 'instance_geometry':
+            ids.append(_url_id(el.get('url')))
+        elif tag == 'instance_node':
+            target = _url_id(el.get('url'))
+            if target in library_nodes and target not in seen:
+                seen.add(target)
+                ids.extend(_referenced_geometries(library_nodes[target], library_nodes, seen))
+    return ids
+
+
+def _geometry_weight(geom):
+    """Rough cost of a geometry: its primitive count."""
+    total = 0
+    for el in geom.iter():
+        if _local(el.tag) in ('triangles', 'polylist', 'polygons', 'tristrips', 'trifans'):
+            total += int(el.get('count', '0') or 0)
+    return max(total, 1)
+
+
+def _absolute_uri(uri, base_dir):
+    """Resolve a relative COLLADA URI (texture path, external reference) against base_dir."""
+    path, sep, fragment = uri.partition('#')
+    if not path or os.path.isabs(path) or urllib.parse.urlsplit(path).scheme:
+        return uri  # local '#id', 'file:///...', 'C:/...' or already absolute
+    full = os.path.abspath(os.path.join(base_dir, urllib.parse.unquote(path)))
+    return pathlib.Path(full).as_uri() + sep + fragment
+
+
+def _absolutize_references(root, base_dir):
+    """Rewrite relative image paths and url values so the parts can live elsewhere."""
+    for el in root.iter():
+        url = el.get('url')
+        if url:
+            el.set('url', _absolute_uri(url, base_dir))
+        if _local(el.tag) != 'image':
+            continue
+        # <image><init_from>path (1.4) or <image><init_from><ref>path (1.5);
+        # <surface><init_from> holds an image id and is left alone
+        for init in el:
+            if _local(init.tag) != 'init_from':
+                continue
+            for target in [init] + [r for r in init if _local(r.tag) == 'ref']:
+                if target.text and target.text.strip():
+                    target.text = _absolute_uri(target.text.strip(), base_dir)
+
+
+def split_collada(filepath, n_parts, out_dir):
+    """Write up to n_parts DAE files, each holding a balanced group of top-level nodes.
+
+    Every partial file keeps the asset, materials, effects, images,
+    controllers and library_nodes of the original, but only the geometries
+    its own nodes instance. Relative texture paths and external references
+    are made absolute, since the parts are written to out_dir. Returns the
+    list of partial file paths, or an empty list if the input cannot be split.
+    """
+    tree = ET.parse(filepath)
+    root = tree.getroot()
+    ns = root.tag.split('}')[0] + '}' if '}' in root.tag else ''
+    if ns:
+        ET.register_namespace('', ns[1:-1])
+
+    visual_scene = _find_visual_scene(root, ns)
+    if visual_scene is None:
+        return []
+    top_nodes = [el for el in visual_scene if _local(el.tag) == 'node']
+    if len(top_nodes) < 2 or n_parts < 2:
+        return []
+    _absolutize_references(root, os.path.dirname(os.path.abspath(filepath)))
+
+    geometries = {g.get('id'): g for g in root.iter(f'{ns}geometry')}
+    library_nodes = {}
+    lib_nodes_el = root.find(f'{ns}library_nodes')
+    if lib_nodes_el is not None:
+        library_nodes = {n.get('id'): n for n in lib_nodes_el.findall(f'{ns}node')}
+
+    # Geometries used by controllers (skins/morphs) are always kept
+    controller_geoms = {_url_id(el.get('source')) for el in root.iter()
+                        if _local(el.tag) in ('skin', 'morph') and el.get('source')}
+
+    weights = {gid: _geometry_weight(g) for gid, g in geometries.items()}
+    node_geoms = [_referenced_geometries(node, library_nodes) for node in top_nodes]
+    node_weights = [sum(weights.get(gid, 1) for gid in ids) or 1 for ids in node_geoms]
+
+    # Longest-processing-time first: heaviest node into the lightest group
+    n_parts = min(n_parts, len(top_nodes))
+    groups = [[] for _ in range(n_parts)]
+    loads = [0] * n_parts
+    for i in sorted(range(len(top_nodes)), key=lambda k: node_weights[k], reverse=True):
+        g = loads.index(min(loads))
+        groups[g].append(i)
+        loads[g] += node_weights[i]
+
+    # Detach the heavy elements once, then re-attach a subset per part
+    for node in top_nodes:
+        visual_scene.remove(node)
+    lib_geoms_el = root.find(f'{ns}library_geometries')
+    if lib_geoms_el is not None:
+        for geom in list(lib_geoms_el):
+            lib_geoms_el.remove(geom)
+
+    paths = []
+    for part_idx, members in enumerate(groups):
+        members.sort()  # keep original node order inside a part
+        keep = set(controller_geoms)
+        for i in members:
+            keep.update(node_geoms[i])
+            visual_scene.append(top_nodes[i])
+        if lib_geoms_el is not None:
+            for gid, geom in geometries.items():
+                if gid in keep:
+                    lib_geoms_el.append(geom)
+
+        path = os.path.join(out_dir, f"part_{part_idx:03d}.dae")
+        tree.write(path, encoding='utf-8', xml_declaration=True)
+        paths.append(path)
+
+        for i in members:
+            visual_scene.remove(top_nodes[i])
+        if lib_geoms_el is not None:
+            for geom in list(lib_geoms_el):
+                lib_geoms_el.remove(geom)
+
+        print(f"[INFO] Part {part_idx}: {len(members)} node(s), weight {loads[part_idx]:,}")
+
+    return paths
+
+
+# ─── BLENDER WORKERS ────────────────────────────────────────────────────────────
+
+def run_blender(blender, script_args, log_path):
+    """Run convert_xml_to_glb.py in a headless Blender, logging to a file."""
+    cmd = [blender, "--background", "--factory-startup", "--python-exit-code", "1",
+           "--python", BLENDER_SCRIPT, "--"] + script_args
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        result = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT)
+    return result.returncode, time.perf_counter() - start
+
+
+def convert_parts(args, part_paths):
+    """Convert every partial DAE to an uncompressed GLB in parallel."""
+    def convert(part_path):
+        glb_path = os.path.splitext(part_path)[0] + ".glb"
+        code, elapsed = run_blender(args.blender, [
+            "--input", part_path, "--output", glb_path,
+            "--metallic", str(args.metallic), "--roughness", str(args.roughness),
+            "--no-draco",
+        ], os.path.splitext(part_path)[0] + ".log")
+        status = "OK" if code == 0 and os.path.exists(glb_path) else f"FAILED ({code})"
+        print(f"  [{status}] {os.path.basename(part_path)} in {elapsed:.1f}s")
+        return glb_path if status == "OK" else None
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        return list(pool.map(convert, part_paths))
+
+
+# ─── MAIN ────────────────────────────────────────────────────────────────────────
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("  LLEDO 3D Pipeline — Parallel XML to GLB Converter")
+    print("=" * 60)
+    print(f"  Input:   {args.input}")
+    print(f"  Output:  {args.output}")
+    print(f"  Workers: {args.workers}")
+    print("=" * 60)
+
+    if not os.path.exists(args.input):
+        print(f"[ERROR] File not found: {args.input}")
+        sys.exit(1)
+
+    tmp_dir = tempfile.mkdtemp(prefix="lledo_parallel_")
+    start = time.perf_counter()
+    try:
+        part_paths = []
+        if os.path.splitext(args.input)[1].lower() not in (".x3d", ".x3dv"):
+            try:
+                part_paths = split_collada(args.input, args.workers, tmp_dir)
+            except ET.ParseError as e:
+                print(f"[WARN] Could not split input ({e})")
+
+        if not part_paths:
+            print("[INFO] Input cannot be split, running a single Blender conversion")
+            script_args = ["--input", args.input, "--output", args.output,
+                           "--metallic", str(args.metallic), "--roughness", str(args.roughness)]
+            if not args.draco:
+                script_args.append("--no-draco")
+            log_path = os.path.join(tmp_dir, "single.log")
+            code, _ = run_blender(args.blender, script_args, log_path)
+            if code != 0:
+                print(f"[ERROR] Conversion failed, see {log_path}")
+                args.keep_temp = True
+            sys.exit(code)
+
+        print(f"\n[INFO] Converting {len(part_paths)} part(s) with {args.workers} worker(s)...")
+        glb_paths = convert_parts(args, part_paths)
+        if not all(glb_paths):
+            print(f"[ERROR] Some parts failed, see logs in {tmp_dir}")
+            args.keep_temp = True
+            sys.exit(1)
+
+        print(f"\n[INFO] Merging {len(glb_paths)} partial GLB(s)...")
+        merge_args = ["--merge", *glb_paths, "--output", os.path.abspath(args.output),
+                      "--metallic", str(args.metallic), "--roughness", str(args.roughness)]
+        if not args.draco:
+            merge_args.append("--no-draco")
+        code, elapsed = run_blender(args.blender, merge_args, os.path.join(tmp_dir, "merge.log"))
+        if code != 0 or not os.path.exists(args.output):
+            print(f"[ERROR] Merge failed, see {os.path.join(tmp_dir, 'merge.log')}")
+            args.keep_temp = True
+            sys.exit(1)
+
+        size_mb = os.path.getsize(args.output) / (1024 * 1024)
+        print(f"[OK] Merged GLB: {args.output} ({size_mb:.2f} MB, merge {elapsed:.1f}s)")
+        print(f"\n[DONE] Pipeline complete in {time.perf_counter() - start:.1f}s.")
+    finally:
+        if args.keep_temp:
+            print(f"[INFO] Temporary files kept in {tmp_dir}")
+        else:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
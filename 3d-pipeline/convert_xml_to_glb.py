@@ -4,15 +4,29 @@ LLEDO 3D Pipeline — XML to GLB Converter (Blender CLI)
 
 Usage:
   blender --background --python convert_xml_to_glb.py -- --input fichier.xml --output output.glb
+  blender --background --python convert_xml_to_glb.py -- --input a.dae --output a.glb --input b.x3d --output b.glb
+  blender --background --python convert_xml_to_glb.py -- --manifest batch.json --summary summary.json
+  blender --background --python convert_xml_to_glb.py -- --merge a.glb b.glb --output output.glb
 
 Supports: COLLADA (.dae), X3D (.x3d), and generic XML (auto-detect).
+Several --input/--output pairs (or a JSON manifest of {"input", "output"}
+entries) are converted in one Blender session, resetting all data blocks
+between files and reusing one material.
+--merge combines partial GLBs (see convert_xml_parallel.py) into one file
+with a single shared material.
 """
 
 import bpy
 import bmesh
+import numpy as np
+from mathutils import Matrix
 import sys
 import os
 import argparse
+import json
+import shutil
+import tempfile
+import time
 import xml.etree.ElementTree as ET
 
 
@@ -27,16 +41,96 @@ def parse_args():
         argv = []
 
     parser = argparse.ArgumentParser(description="Convert XML 3D file to GLB")
-    parser.add_argument("--input", required=True, help="Input XML/DAE/X3D file path")
-    parser.add_argument("--output", required=True, help="Output GLB file path")
+    parser.add_argument("--input", action="append", default=[],
+                        help="Input XML/DAE/X3D file path (repeat with --output for a batch)")
+    parser.add_argument("--output", action="append", default=[], help="Output GLB file path")
+    parser.add_argument("--manifest", help='JSON file listing [{"input": ..., "output": ...}, ...]')
+    parser.add_argument("--summary", help="Write a JSON summary (per-file timing and size) to this path")
+    parser.add_argument("--merge", nargs="+", metavar="GLB",
+                        help="Merge these partial GLBs into --output instead of converting --input")
     parser.add_argument("--metallic", type=float, default=1.0, help="Metallic value (0-1)")
     parser.add_argument("--roughness", type=float, default=0.3, help="Roughness value (0-1)")
     parser.add_argument("--draco", action="store_true", default=True, help="Enable Draco compression")
-    return parser.parse_args(argv)
+    parser.add_argument("--no-draco", dest="draco", action="store_false", help="Disable Draco compression")
+    parser.add_argument("--draco-tune", action="store_true",
+                        help="Search Draco level/quantization for the smallest file within the error budget")
+    parser.add_argument("--draco-max-error", type=float, default=5e-4,
+                        help="Max position error for --draco-tune, as a fraction of the bounding-box diagonal")
+    parser.add_argument("--draco-max-normal-error", type=float, default=3.0,
+                        help="Max normal error for --draco-tune, degrees (95th percentile)")
+    parser.add_argument("--draco-target-mb", type=float, default=None,
+                        help="Size target for --draco-tune: the most accurate setting that fits is kept; "
+                             "warns if unreachable within the error budget")
+    parser.add_argument("--draco-report", default=None,
+                        help="Write the --draco-tune trade-off curve as JSON")
+    parser.add_argument("--legacy-clean", action="store_true",
+                        help="Clean geometry with per-object operators instead of the batched fast path")
+    args = parser.parse_args(argv)
+
+    if args.merge:
+        if len(args.output) != 1:
+            parser.error("--merge needs exactly one --output")
+        return args
+
+    if len(args.input) != len(args.output):
+        parser.error("--input and --output must be given in pairs")
+    args.jobs = list(zip(args.input, args.output))
+    if args.manifest:
+        with open(args.manifest, encoding="utf-8") as f:
+            args.jobs += [(entry["input"], entry["output"]) for entry in json.load(f)]
+    if not args.jobs:
+        parser.error("--input/--output or --manifest is required unless --merge is given")
+    return args
 
 
 # ─── FORMAT DETECTION ────────────────────────────────────────────────────────────
 
+SNIFF_MAX_BYTES = 64 * 1024   # never read more than this to detect the format
+SNIFF_MAX_CHILDREN = 32       # first-level children inspected after the root
+
+
+def _sniff_xml_tags(filepath):
+    """Return (root_tag, first_level_child_tags) from the start of an XML file.
+
+    Feeds an incremental parser in small chunks and stops as soon as the root
+    identifies the format, after SNIFF_MAX_CHILDREN first-level children, or
+    after SNIFF_MAX_BYTES — whichever comes first — so the cost does not
+    depend on file size.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root_tag = None
+    children = []
+    depth = 0
+    read = 0
+
+    with open(filepath, "rb") as f:
+        while read < SNIFF_MAX_BYTES:
+            chunk = f.read(4096)
+            if not chunk:
+                break
+            read += len(chunk)
+            parser.feed(chunk)
+
+            for event, elem in parser.read_events():
+                if event == "end":
+                    depth -= 1
+                    if depth == 1:
+                        elem.clear()
+                    continue
+
+                depth += 1
+                if depth == 1:
+                    root_tag = elem.tag
+                    if "collada" in root_tag.lower() or "x3d" in root_tag.lower():
+                        return root_tag, children
+                elif depth == 2:
+                    children.append(elem.tag)
+                    if len(children) >= SNIFF_MAX_CHILDREN:
+                        return root_tag, children
+
+    return root_tag, children
+
+
 def detect_format(filepath):
     """Auto-detect the XML 3D format by inspecting the file content."""
     ext = os.path.splitext(filepath)[1].lower()
@@ -46,29 +140,30 @@ def detect_format(filepath):
         return "COLLADA"
     if ext in (".x3d", ".x3dv"):
         return "X3D"
+    if ext in (".glb", ".gltf"):
+        return "GLTF"
 
-    # Content-based detection for .xml or unknown extensions
+    # Content-based detection for .xml or unknown extensions (header only)
     try:
-        tree = ET.parse(filepath)
-        root = tree.getroot()
-        tag = root.tag.lower()
-        ns = root.tag  # full tag with namespace
+        root_tag, child_tags = _sniff_xml_tags(filepath)
+    except ET.ParseError:
+        root_tag, child_tags = None, []
 
-        if "collada" in tag or "collada" in ns.lower():
+    if root_tag is not None:
+        tag = root_tag.lower()
+
+        if "collada" in tag:
             return "COLLADA"
         if "x3d" in tag:
             return "X3D"
 
         # Check first-level children
-        children_tags = [child.tag.lower() for child in root]
+        children_tags = [t.lower() for t in child_tags]
         if any("scene" in t and "x3d" in t for t in children_tags):
             return "X3D"
         if any("library" in t for t in children_tags):
             return "COLLADA"
 
-    except ET.ParseError:
-        pass
-
     # Default: try COLLADA first (most common for industrial assemblies)
     print(f"[WARN] Could not auto-detect format for '{filepath}', trying COLLADA...")
     return "COLLADA"
@@ -96,6 +191,22 @@ def clear_scene():
             bpy.data.lights.remove(block)
 
 
+def reset_data(keep=()):
+    """Remove every object and data block left by a previous file.
+
+    Used between files of a batch so each conversion starts from an empty
+    session; data blocks in ``keep`` (the shared material) survive.
+    """
+    keep = set(keep)
+    for collection in (bpy.data.objects, bpy.data.meshes, bpy.data.materials,
+                       bpy.data.images, bpy.data.textures, bpy.data.cameras,
+                       bpy.data.lights, bpy.data.curves, bpy.data.armatures,
+                       bpy.data.actions, bpy.data.collections):
+        blocks = [block for block in collection if block not in keep]
+        if blocks:
+            bpy.data.batch_remove(blocks)
+
+
 # ─── IMPORT ──────────────────────────────────────────────────────────────────────
 
 def import_file(filepath, fmt):
@@ -111,6 +222,8 @@ def import_file(filepath, fmt):
         bpy.ops.wm.collada_import(filepath=abs_path)
     elif fmt == "X3D":
         bpy.ops.import_scene.x3d(filepath=abs_path)
+    elif fmt == "GLTF":
+        bpy.ops.import_scene.gltf(filepath=abs_path)
     else:
         # Fallback: try COLLADA
         try:
@@ -126,8 +239,11 @@ def import_file(filepath, fmt):
 
 # ─── GEOMETRY CLEANUP ────────────────────────────────────────────────────────────
 
-def clean_geometry(objects):
+def clean_geometry(objects, fast=True):
     """Clean all mesh objects: remove doubles, recalculate normals, apply transforms."""
+    if fast:
+        return clean_geometry_fast(objects)
+
     print(f"[INFO] Cleaning geometry for {len(objects)} object(s)...")
 
     for obj in objects:
@@ -165,6 +281,72 @@ def clean_geometry(objects):
     print("[INFO] Geometry cleanup complete")
 
 
+def _is_rigid(matrix):
+    """True if the matrix is a proper rotation + translation (no scale, no mirror)."""
+    scale = matrix.to_scale()
+    return (abs(matrix.to_3x3().determinant() - 1.0) < 1e-6
+            and all(abs(s - 1.0) < 1e-6 for s in scale))
+
+
+def _bake_transform(obj):
+    """Apply the object's loc/rot/scale to its mesh data, like transform_apply."""
+    basis = obj.matrix_basis.copy()
+    if basis == Matrix.Identity(4):
+        return
+    obj.data.transform(basis, shape_keys=True)
+    # Keep children in place, as transform_apply does
+    for child in obj.children:
+        child.matrix_parent_inverse = basis @ child.matrix_parent_inverse
+    obj.matrix_basis = Matrix.Identity(4)
+
+
+def _clean_mesh(mesh):
+    """Merge by distance, recalculate outward normals and smooth-shade one mesh."""
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bmesh.ops.remove_doubles(bm, verts=bm.verts, dist=0.0001)
+    bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
+    bm.to_mesh(mesh)
+    bm.free()
+
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
+    mesh.update()
+
+
+def clean_geometry_fast(objects):
+    """Operator-free clean_geometry: same result, no per-object select/transform_apply.
+
+    Transforms are written straight into the mesh data. Mesh data shared by
+    several objects is cleaned once; when every user only moves/rotates it
+    (cleanup is invariant under rigid motion) the cleaned data is copied per
+    user before baking, otherwise each user gets its own copy cleaned after
+    baking, exactly like the operator path would.
+    """
+    users = {}
+    for obj in objects:
+        if obj.type == 'MESH':
+            users.setdefault(obj.data, []).append(obj)
+
+    n_objects = sum(len(objs) for objs in users.values())
+    print(f"[INFO] Cleaning geometry for {n_objects} object(s), {len(users)} mesh data block(s)...")
+
+    for mesh, objs in users.items():
+        shared_clean = len(objs) > 1 and all(_is_rigid(obj.matrix_basis) for obj in objs)
+        if shared_clean:
+            _clean_mesh(mesh)
+
+        # Give every extra user its own copy before anything is baked in place
+        for obj in objs[1:]:
+            obj.data = mesh.copy()
+
+        for obj in objs:
+            _bake_transform(obj)
+            if not shared_clean:
+                _clean_mesh(obj.data)
+
+    print("[INFO] Geometry cleanup complete")
+
+
 # ─── PBR MATERIAL ────────────────────────────────────────────────────────────────
 
 def create_metal_material(metallic=1.0, roughness=0.3):
@@ -230,8 +412,14 @@ def apply_material(objects, material):
 
 # ─── EXPORT ──────────────────────────────────────────────────────────────────────
 
-def export_glb(filepath, use_draco=True):
-    """Export scene to GLB with optional Draco compression."""
+DRACO_DEFAULTS = {'level': 6, 'position': 14, 'normal': 10, 'texcoord': 12, 'color': 10}
+
+
+def export_glb(filepath, use_draco=True, draco=None):
+    """Export scene to GLB with optional Draco compression.
+
+    ``draco`` overrides DRACO_DEFAULTS (level and per-attribute quantization bits).
+    """
     abs_path = os.path.abspath(filepath)
 
     # Ensure output directory exists
@@ -255,13 +443,14 @@ def export_glb(filepath, use_draco=True):
     }
 
     if use_draco:
+        draco = dict(DRACO_DEFAULTS, **(draco or {}))
         export_settings.update({
             'export_draco_mesh_compression_enable': True,
-            'export_draco_mesh_compression_level': 6,
-            'export_draco_position_quantization': 14,
-            'export_draco_normal_quantization': 10,
-            'export_draco_texcoord_quantization': 12,
-            'export_draco_color_quantization': 10,
+            'export_draco_mesh_compression_level': draco['level'],
+            'export_draco_position_quantization': draco['position'],
+            'export_draco_normal_quantization': draco['normal'],
+            'export_draco_texcoord_quantization': draco['texcoord'],
+            'export_draco_color_quantization': draco['color'],
         })
 
     bpy.ops.export_scene.gltf(**export_settings)
@@ -273,42 +462,356 @@ def export_glb(filepath, use_draco=True):
         print(f"[ERROR] Export failed — file not created")
 
 
+# ─── DRACO TUNING ────────────────────────────────────────────────────────────────
+
+DRACO_POSITION_BITS = (10, 11, 12, 13, 14, 16)
+DRACO_NORMAL_BITS = (6, 8, 10, 12)
+DRACO_LEVELS = (0, 6, 10)
+DRACO_ERROR_SAMPLES = 100000
+
+
+def _world_corners(objects):
+    """World-space position and unit normal of every face corner."""
+    positions, normals = [], []
+    for obj in objects:
+        mesh = obj.data
+        n_verts, n_loops = len(mesh.vertices), len(mesh.loops)
+        if n_loops == 0:
+            continue
+
+        co = np.empty(n_verts * 3, dtype=np.float64)
+        mesh.vertices.foreach_get("co", co)
+        vidx = np.empty(n_loops, dtype=np.int64)
+        mesh.loops.foreach_get("vertex_index", vidx)
+        nor = np.empty(n_loops * 3, dtype=np.float64)
+        if hasattr(mesh, "corner_normals"):         # Blender 4.1+
+            mesh.corner_normals.foreach_get("vector", nor)
+        else:
+            mesh.calc_normals_split()
+            mesh.loops.foreach_get("normal", nor)
+
+        m = np.array(obj.matrix_world)
+        rot = m[:3, :3]
+        positions.append(co.reshape(-1, 3)[vidx] @ rot.T + m[:3, 3])
+        nor = nor.reshape(-1, 3) @ np.linalg.inv(rot)
+        normals.append(nor / np.maximum(np.linalg.norm(nor, axis=1, keepdims=True), 1e-12))
+
+    if not positions:
+        return np.empty((0, 3)), np.empty((0, 3))
+    return np.concatenate(positions), np.concatenate(normals)
+
+
+class DracoErrorProbe:
+    """Measure how far a Draco-compressed GLB drifts from the current scene.
+
+    Decodes a candidate by re-importing it (the glTF importer decodes Draco),
+    then compares a sample of its corners against a KD-tree of the
+    uncompressed geometry: position error is the maximum nearest-neighbour
+    distance relative to the bounding-box diagonal, normal error the 95th
+    percentile angle in degrees against the nearest reference normal.
+
+    The tree is a scipy cKDTree built and queried in bulk from the NumPy
+    arrays; Blender builds without scipy fall back to mathutils' KDTree.
+    """
+
+    def __init__(self, objects):
+        positions, self.normals = _world_corners(objects)
+        self.diagonal = float(np.linalg.norm(np.ptp(positions, axis=0))) or 1.0
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            print("[WARN] scipy not available in Blender's Python, using the slower mathutils KDTree")
+            from mathutils.kdtree import KDTree
+            self.tree = KDTree(len(positions))
+            for i, co in enumerate(positions):
+                self.tree.insert(co, i)
+            self.tree.balance()
+            self.bulk = False
+        else:
+            self.tree = cKDTree(positions)
+            self.bulk = True
+
+    def nearest(self, positions):
+        """(distance, index) of the nearest reference corner for every position."""
+        if self.bulk:
+            dist, nearest = self.tree.query(positions, workers=-1)
+            return dist, nearest.astype(np.int64)
+        dist = np.empty(len(positions))
+        nearest = np.empty(len(positions), dtype=np.int64)
+        for i, co in enumerate(positions):
+            _, nearest[i], dist[i] = self.tree.find(co)
+        return dist, nearest
+
+    def measure(self, path):
+        data = (bpy.data.objects, bpy.data.meshes, bpy.data.materials, bpy.data.images)
+        before = [set(collection) for collection in data]
+        bpy.ops.import_scene.gltf(filepath=os.path.abspath(path))
+        created = [[b for b in collection if b not in seen] for collection, seen in zip(data, before)]
+
+        decoded = [obj for obj in created[0] if obj.type == 'MESH']
+        positions, normals = _world_corners(decoded)
+
+        for blocks in created:
+            if blocks:
+                bpy.data.batch_remove(blocks)
+
+        if len(positions) > DRACO_ERROR_SAMPLES:
+            pick = np.random.default_rng(0).choice(len(positions), DRACO_ERROR_SAMPLES, replace=False)
+            positions, normals = positions[pick], normals[pick]
+
+        dist, nearest = self.nearest(positions)
+
+        cos = np.clip(np.einsum('ij,ij->i', normals, self.normals[nearest]), -1.0, 1.0)
+        return {
+            'position_error': float(dist.max(initial=0.0)) / self.diagonal,
+            'normal_error_deg': float(np.percentile(np.degrees(np.arccos(cos)), 95)) if len(cos) else 0.0,
+        }
+
+
+def tune_draco(output_path, objects, max_error, max_normal_error, target_bytes=None, report_path=None):
+    """Export a Draco GLB within the error budget and report the trade-off curve.
+
+    Position and normal quantization are independent in Draco and the
+    compression level is lossless, so the search is staged: position bits,
+    then normal bits, then every level at those bit depths; every candidate
+    is measured. Texture coordinate and color bits are not searched (the
+    probe has no error metric for them) and are reported as fixed. Without
+    a size target each stage stops at the fewest bits within the error
+    budget and the smallest file wins. With ``target_bytes``, a stage keeps adding bits
+    while the file still fits the target, and the most accurate candidate
+    that fits is chosen (the smallest one if none does).
+    """
+    probe = DracoErrorProbe(objects)
+    out_dir = os.path.dirname(os.path.abspath(output_path)) or "."
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".draco_tune_", dir=out_dir)
+    curve = []
+    fixed = {k: DRACO_DEFAULTS[k] for k in ('texcoord', 'color')}
+
+    def trial(**settings):
+        draco = dict(DRACO_DEFAULTS, **settings)
+        path = os.path.join(tmp_dir, "l{level}_p{position}_n{normal}.glb".format(**draco))
+        export_glb(path, draco=draco)
+        entry = dict(draco, bytes=os.path.getsize(path), path=path)
+        entry.update(probe.measure(path))
+        curve.append(entry)
+        return entry
+
+    def fits(entry):
+        return bool(target_bytes) and entry['bytes'] <= target_bytes
+
+    def search(bits_list, make, within):
+        """Fewest bits within budget, then more bits while the result still fits the target."""
+        chosen = entry = None
+        for bits in bits_list:
+            entry = make(bits)
+            if chosen is None:
+                if within(entry):
+                    chosen = entry
+                    if not fits(entry):
+                        break
+            elif fits(entry):
+                chosen = entry
+            else:
+                break
+        return chosen or entry
+
+    try:
+        top = max(DRACO_LEVELS)
+
+        position = search(DRACO_POSITION_BITS,
+                          lambda bits: trial(level=top, position=bits, normal=DRACO_NORMAL_BITS[-1]),
+                          lambda e: e['position_error'] <= max_error)['position']
+
+        best_bits = search(DRACO_NORMAL_BITS,
+                           lambda bits: trial(level=top, position=position, normal=bits),
+                           lambda e: e['normal_error_deg'] <= max_normal_error)
+
+        for level in DRACO_LEVELS:
+            if level != top:
+                trial(level=level, position=position, normal=best_bits['normal'])
+
+        within = [e for e in curve
+                  if e['position_error'] <= max_error and e['normal_error_deg'] <= max_normal_error]
+        if not within:
+            print("[WARN] No candidate within the error budget, keeping the most accurate one")
+            within = [min(curve, key=lambda e: (e['position_error'], e['normal_error_deg']))]
+        on_target = [e for e in within if fits(e)]
+        if on_target:
+            best = min(on_target, key=lambda e: (e['position_error'], e['normal_error_deg'], e['bytes']))
+        else:
+            best = min(within, key=lambda e: e['bytes'])
+            if target_bytes:
+                print(f"[WARN] Target size {target_bytes:,} B not reachable within the error budget "
+                      f"(best: {best['bytes']:,} B)")
+
+        print("\n[INFO] Draco trade-off curve:")
+        print(f"  {'level':>5} {'pos':>4} {'nor':>4} {'bytes':>12} {'pos err':>10} {'nor err':>8}")
+        for e in sorted(curve, key=lambda e: e['bytes']):
+            mark = " <" if e is best else ""
+            print(f"  {e['level']:>5} {e['position']:>4} {e['normal']:>4} {e['bytes']:>12,} "
+                  f"{e['position_error']:>10.2e} {e['normal_error_deg']:>7.2f}°{mark}")
+
+        os.replace(best['path'], os.path.abspath(output_path))
+        print(f"[OK] Tuned Draco: level {best['level']}, position {best['position']} bits, "
+              f"normal {best['normal']} bits → {best['bytes']:,} B")
+        print("[INFO] Not searched (defaults): " + ", ".join(f"{k} {v} bits" for k, v in fixed.items()))
+
+        result = {
+            'chosen': {k: v for k, v in best.items() if k != 'path'},
+            'fixed': fixed,
+            'curve': [{k: v for k, v in e.items() if k != 'path'} for e in curve],
+            'max_error': max_error,
+            'max_normal_error_deg': max_normal_error,
+            'target_bytes': target_bytes,
+        }
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, indent=2)
+        return result
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# ─── MERGE ───────────────────────────────────────────────────────────────────────
+
+def merge_glbs(paths, output, metallic=1.0, roughness=0.3, use_draco=True):
+    """Import already-cleaned partial GLBs into one scene and export a single GLB.
+
+    Each partial file brings its own copy of the material; they are all
+    replaced by one shared material before export. Node hierarchies are
+    kept as imported, so every subassembly stays under its own root.
+    """
+    clear_scene()
+
+    for path in paths:
+        import_file(path, "GLTF")
+
+    objects = [obj for obj in bpy.context.scene.objects if obj.type == 'MESH']
+    if not objects:
+        print("[ERROR] No mesh objects in the partial GLBs. Aborting.")
+        sys.exit(1)
+
+    material = create_metal_material(metallic, roughness)
+    apply_material(objects, material)
+    for block in list(bpy.data.materials):
+        if block.users == 0:
+            bpy.data.materials.remove(block)
+
+    export_glb(output, use_draco=use_draco)
+
+
 # ─── MAIN ────────────────────────────────────────────────────────────────────────
 
-def main():
-    args = parse_args()
+def _output_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
 
-    print("=" * 60)
-    print("  LLEDO 3D Pipeline — XML to GLB Converter")
-    print("=" * 60)
-    print(f"  Input:  {args.input}")
-    print(f"  Output: {args.output}")
-    print(f"  Metal:  {args.metallic} | Rough: {args.roughness}")
-    print("=" * 60)
+
+def convert_file(input_path, output_path, material, args):
+    """Convert one file inside the current session. Returns a summary entry."""
+    start = time.perf_counter()
+    entry = {"input": input_path, "output": output_path}
+    # An output left by an earlier run must not count as this run's result
+    previous = _output_stamp(output_path)
 
     # 1. Detect format
-    fmt = detect_format(args.input)
+    fmt = detect_format(input_path)
+    entry["format"] = fmt
     print(f"[INFO] Detected format: {fmt}")
 
-    # 2. Clear scene
-    clear_scene()
+    # 2. Reset session (keeps the shared material)
+    reset_data(keep=(material,))
 
     # 3. Import
-    objects = import_file(args.input, fmt)
+    objects = import_file(input_path, fmt)
+    entry["objects"] = len(objects)
 
     if not objects:
-        print("[ERROR] No mesh objects imported. Aborting.")
-        sys.exit(1)
+        print("[ERROR] No mesh objects imported.")
+        entry.update(status="empty", seconds=round(time.perf_counter() - start, 3), bytes=0)
+        return entry
 
     # 4. Clean geometry
-    clean_geometry(objects)
+    clean_geometry(objects, fast=not args.legacy_clean)
 
-    # 5. Create and apply material
-    material = create_metal_material(args.metallic, args.roughness)
+    # 5. Apply the shared material
     apply_material(objects, material)
 
     # 6. Export GLB
-    export_glb(args.output, use_draco=args.draco)
+    if args.draco and args.draco_tune:
+        target = int(args.draco_target_mb * 1024 * 1024) if args.draco_target_mb else None
+        report = args.draco_report
+        if report and len(args.jobs) > 1:
+            report = os.path.splitext(output_path)[0] + ".draco.json"
+        entry["draco"] = tune_draco(output_path, objects, args.draco_max_error,
+                                    args.draco_max_normal_error, target, report)["chosen"]
+    else:
+        export_glb(output_path, use_draco=args.draco)
+
+    stamp = _output_stamp(output_path)
+    ok = stamp is not None and stamp != previous
+    entry.update(
+        status="ok" if ok else "failed",
+        seconds=round(time.perf_counter() - start, 3),
+        bytes=os.path.getsize(output_path) if ok else 0,
+    )
+    return entry
+
+
+def main():
+    args = parse_args()
+
+    if args.merge:
+        print(f"[INFO] Merging {len(args.merge)} partial GLB(s) into {args.output[0]}")
+        merge_glbs(args.merge, args.output[0], args.metallic, args.roughness, use_draco=args.draco)
+        print("\n[DONE] Merge complete.")
+        return
+
+    print("=" * 60)
+    print("  LLEDO 3D Pipeline — XML to GLB Converter")
+    print("=" * 60)
+    for input_path, output_path in args.jobs:
+        print(f"  Input:  {input_path}")
+        print(f"  Output: {output_path}")
+    print(f"  Metal:  {args.metallic} | Rough: {args.roughness}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    material = create_metal_material(args.metallic, args.roughness)
+    # Survive reset_data() and the zero-user window between files
+    material.use_fake_user = True
+
+    results = []
+    for i, (input_path, output_path) in enumerate(args.jobs, 1):
+        print(f"\n[{i}/{len(args.jobs)}] {input_path}")
+        file_start = time.perf_counter()
+        try:
+            results.append(convert_file(input_path, output_path, material, args))
+        except Exception as e:
+            print(f"[ERROR] {input_path}: {e}")
+            results.append({"input": input_path, "output": output_path, "status": "failed", "error": str(e),
+                            "seconds": round(time.perf_counter() - file_start, 3), "bytes": 0})
+
+    summary = {
+        "files": results,
+        "total_seconds": round(time.perf_counter() - start, 3),
+        "total_bytes": sum(r["bytes"] for r in results),
+        "failed": sum(r["status"] != "ok" for r in results),
+    }
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"[INFO] Summary written to {args.summary}")
+    if len(results) > 1:
+        print(json.dumps(summary, indent=2))
+
+    if summary["failed"]:
+        print(f"\n[ERROR] {summary['failed']} file(s) failed.")
+        sys.exit(1)
 
     print("\n[DONE] Pipeline complete.")
 
@@ -1,36 +1,637 @@
-"""Decimate an STL file to reduce triangle count for WebGL rendering."""
+"""Decimate an STL file to reduce triangle count for WebGL rendering.
+
+Usage:
+  python decimate-stl.py model.stl [target_faces]
+  python decimate-stl.py --parts stl_dir/ other.stl --target 200000 --out-dir out/
+  python decimate-stl.py --batch models/ --target 200000 --out-dir out/
+
+--parts splits one face budget across many part meshes (e.g. the output of
+convert_3dxml_to_glb.py --stl-dir) by surface area, size and curvature, and
+decimates the parts in parallel.
+
+--batch decimates every STL of a directory tree to the same face target, in
+parallel. Results are cached by input content hash, target and method (in
+<out-dir>/.decimate-cache by default), so re-runs on unchanged models are
+just file copies.
+
+--method cluster swaps quadric decimation for grid vertex clustering: much
+faster and lighter on 10M+ face meshes, good enough for web previews. The
+method and measured reduction are written into the output STL header.
+
+Binary STLs are memory-mapped and welded chunk by chunk into float32
+vertices and uint32 faces, so multi-GB exports never exist as float64
+triangle soups in memory. ASCII STLs fall back to trimesh.
+"""
 import sys
 import os
-import trimesh
-
-input_path = sys.argv[1] if len(sys.argv) > 1 else r"d:\MPEB\models\roller-h125.stl"
-target_faces = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
-output_path = input_path.replace('.stl', f'_decimated.stl')
-
-print(f"Loading STL: {input_path}")
-mesh = trimesh.load(input_path)
-print(f"Original: {len(mesh.faces):,} faces, {len(mesh.vertices):,} vertices")
-print(f"File size: {os.path.getsize(input_path) / 1024 / 1024:.1f} MB")
-
-if len(mesh.faces) <= target_faces:
-    print(f"Already under {target_faces:,} faces, skipping.")
-    sys.exit(0)
-
-ratio = 1.0 - (target_faces / len(mesh.faces))
-print(f"\nDecimating to ~{target_faces:,} faces (reduction: {ratio:.4f})...")
-
-try:
-    # Try with face_count (older trimesh)
-    simplified = mesh.simplify_quadric_decimation(target_faces)
-except (ValueError, TypeError):
-    # Use fast_simplification directly with target_reduction
-    import fast_simplification
-    verts, faces = fast_simplification.simplify(
-        mesh.vertices, mesh.faces, target_reduction=ratio
-    )
-    simplified = trimesh.Trimesh(vertices=verts, faces=faces)
-print(f"Result: {len(simplified.faces):,} faces, {len(simplified.vertices):,} vertices")
-
-simplified.export(output_path)
-size_mb = os.path.getsize(output_path) / 1024 / 1024
-print(f"Saved: {output_path} ({size_mb:.1f} MB)")
+import struct
+import time
+import argparse
+import glob
+import hashlib
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# ─── OUT-OF-CORE STL LOADER ─────────────────────────────────────────────────────
+
+STL_RECORD = np.dtype([('normal', '<f4', (3,)), ('verts', '<f4', (3, 3)), ('attr', '<u2')])
+LOAD_CHUNK = 1 << 20          # triangles per chunk (~50 MB of STL records)
+EMPTY = np.uint32(0xFFFFFFFF)
+
+
+def is_binary_stl(path):
+    """A binary STL's size is exactly 84 + 50 * triangle count."""
+    size = os.path.getsize(path)
+    if size < 84:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(80)
+        n_tris = struct.unpack('<I', f.read(4))[0]
+    return size == 84 + n_tris * STL_RECORD.itemsize
+
+
+class VertexHashTable:
+    """Open-addressing table mapping exact float32 positions to vertex ids.
+
+    Keys are the raw uint32 bit patterns of x, y, z. Capacity tracks the
+    number of *unique* vertices (kept under 50% load), never the number of
+    triangle corners, so memory stays bounded by the welded output.
+    """
+
+    def __init__(self, capacity=1 << 20):
+        self.capacity = 1 << max(int(capacity) - 1, 1).bit_length()
+        self.slot_key = np.zeros((self.capacity, 3), dtype=np.uint32)
+        self.slot_id = np.full(self.capacity, EMPTY, dtype=np.uint32)
+        self.keys = np.empty((0, 3), dtype=np.uint32)
+        self._new_keys = []
+        self.count = 0
+
+    def _hash(self, keys):
+        k = keys.astype(np.uint64)
+        h = (k[:, 0] * np.uint64(73856093)) ^ (k[:, 1] * np.uint64(19349663)) ^ (k[:, 2] * np.uint64(83492791))
+        h ^= h >> np.uint64(29)
+        return (h & np.uint64(self.capacity - 1)).astype(np.int64)
+
+    def _place(self, keys, ids):
+        """Store known-new unique keys with their ids (used when growing)."""
+        slots = self._hash(keys)
+        pending = np.arange(len(keys))
+        while pending.size:
+            s = slots[pending]
+            free = self.slot_id[s] == EMPTY
+            won = np.zeros(len(pending), dtype=bool)
+            if free.any():
+                uslots, first = np.unique(s[free], return_index=True)
+                winners = np.flatnonzero(free)[first]
+                self.slot_id[uslots] = ids[pending[winners]]
+                self.slot_key[uslots] = keys[pending[winners]]
+                won[winners] = True
+            pending = pending[~won]
+            slots[pending] = (slots[pending] + 1) & (self.capacity - 1)
+
+    def _grow(self, needed):
+        keys = self.vertex_keys()
+        capacity = self.capacity
+        while needed > capacity // 2:
+            capacity *= 2
+        self.capacity = capacity
+        self.slot_key = np.zeros((capacity, 3), dtype=np.uint32)
+        self.slot_id = np.full(capacity, EMPTY, dtype=np.uint32)
+        self._place(keys, np.arange(len(keys), dtype=np.uint32))
+
+    def insert(self, keys):
+        """Return the vertex id of every key row, adding unseen keys."""
+        rows = np.ascontiguousarray(keys).view(np.dtype((np.void, 12))).reshape(-1)
+        _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+        unique = keys[first]
+
+        if self.count + len(unique) > self.capacity // 2:
+            self._grow(self.count + len(unique))
+
+        ids = np.empty(len(unique), dtype=np.uint32)
+        slots = self._hash(unique)
+        pending = np.arange(len(unique))
+        while pending.size:
+            s = slots[pending]
+            sid = self.slot_id[s]
+            occupied = sid != EMPTY
+            match = occupied & np.all(self.slot_key[s] == unique[pending], axis=1)
+            ids[pending[match]] = sid[match]
+            done = match.copy()
+
+            free = ~occupied
+            if free.any():
+                uslots, first_free = np.unique(s[free], return_index=True)
+                winners = np.flatnonzero(free)[first_free]
+                new_ids = np.arange(self.count, self.count + len(winners), dtype=np.uint32)
+                self.slot_id[uslots] = new_ids
+                self.slot_key[uslots] = unique[pending[winners]]
+                self._new_keys.append(unique[pending[winners]])
+                self.count += len(winners)
+                ids[pending[winners]] = new_ids
+                done[winners] = True
+
+            # Occupied by another key: probe on. Lost a race for a free slot: retry it.
+            advance = occupied & ~match
+            slots[pending[advance]] = (slots[pending[advance]] + 1) & (self.capacity - 1)
+            pending = pending[~done]
+
+        return ids[inverse.reshape(-1)]
+
+    def vertex_keys(self):
+        if self._new_keys:
+            self.keys = np.concatenate([self.keys, *self._new_keys])
+            self._new_keys = []
+        return self.keys
+
+    def vertices(self):
+        return self.vertex_keys().view(np.float32)
+
+
+def load_binary_stl(path, chunk=LOAD_CHUNK):
+    """Memory-map a binary STL and weld it chunk by chunk.
+
+    Returns (vertices float32 (n, 3), faces uint32 (m, 3)).
+    """
+    n_tris = (os.path.getsize(path) - 84) // STL_RECORD.itemsize
+    records = np.memmap(path, dtype=STL_RECORD, mode='r', offset=84, shape=(n_tris,))
+    # Start small and let the table grow with the unique vertices actually seen:
+    # sizing it from the triangle count would allocate GBs before any hashing
+    table = VertexHashTable(capacity=min(max(n_tris, 1 << 16), 1 << 20))
+    faces = np.empty((n_tris, 3), dtype=np.uint32)
+
+    for start in range(0, n_tris, chunk):
+        corners = np.array(records['verts'][start:start + chunk], dtype=np.float32).reshape(-1, 3)
+        corners += np.float32(0.0)    # -0.0 → 0.0 so both weld together
+        faces[start:start + chunk] = table.insert(corners.view(np.uint32)).reshape(-1, 3)
+
+    del records
+    return table.vertices(), faces
+
+
+def load_stl(path):
+    """Load an STL as compact (float32 vertices, uint32 faces) arrays."""
+    if is_binary_stl(path):
+        return load_binary_stl(path)
+
+    import trimesh
+    mesh = trimesh.load(path)
+    return mesh.vertices.astype(np.float32), mesh.faces.astype(np.uint32)
+
+
+def save_stl(path, vertices, faces, header=b'decimate-stl'):
+    """Write a binary STL from vertex/index arrays (header: up to 80 bytes)."""
+    tris = vertices[faces.astype(np.int64)].astype(np.float32)
+    normals = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    records = np.zeros(len(tris), dtype=STL_RECORD)
+    records['normal'] = np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
+    records['verts'] = tris
+    with open(path, 'wb') as f:
+        f.write(header[:80].ljust(80, b'\x00'))
+        f.write(struct.pack('<I', len(records)))
+        f.write(records.tobytes())
+
+
+# ─── DECIMATION ─────────────────────────────────────────────────────────────────
+
+def decimate_quadric(vertices, faces, target_faces):
+    """Quadric decimation, fed the compact arrays directly when possible."""
+    ratio = 1.0 - (target_faces / len(faces))
+    try:
+        import fast_simplification
+        return fast_simplification.simplify(vertices, faces.view(np.int32), target_reduction=ratio)
+    except ImportError:
+        pass
+
+    import trimesh
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+    try:
+        # Try with face_count (older trimesh)
+        simplified = mesh.simplify_quadric_decimation(target_faces)
+    except (ValueError, TypeError):
+        simplified = mesh.simplify_quadric_decimation(face_count=target_faces)
+    return simplified.vertices, simplified.faces
+
+
+def _cluster(vertices, faces, size, origin):
+    """Snap vertices to a grid of cell ``size``; return (labels, n_cells, faces)."""
+    cells = np.floor((vertices - origin) / size).astype(np.int64)
+    dims = cells.max(axis=0) + 1
+    key = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    _, labels = np.unique(key, return_inverse=True)
+    labels = labels.reshape(-1)
+
+    f = labels[faces]
+    f = f[(f[:, 0] != f[:, 1]) & (f[:, 1] != f[:, 2]) & (f[:, 0] != f[:, 2])]
+    # Drop faces collapsed onto the same three cells (keep the first winding)
+    rows = np.ascontiguousarray(np.sort(f, axis=1)).view(np.dtype((np.void, f.dtype.itemsize * 3)))
+    _, first = np.unique(rows.reshape(-1), return_index=True)
+    return labels, int(labels.max()) + 1 if len(labels) else 0, f[np.sort(first)]
+
+
+def decimate_cluster(vertices, faces, target_faces, max_steps=24):
+    """Grid vertex clustering with a cell size searched to land just under target_faces.
+
+    Each step is one O(n) clustering pass: the cell size is first scaled
+    from the mean edge length (faces ∝ 1/size² on surfaces), bracketed,
+    then bisected in log space. Cluster positions are the mean of their
+    vertices.
+    """
+    vertices = np.asarray(vertices, dtype=np.float32)
+    faces = np.asarray(faces, dtype=np.int64)
+    origin = vertices.min(axis=0)
+
+    edges = vertices[faces[:, 1]] - vertices[faces[:, 0]]
+    mean_edge = float(np.mean(np.linalg.norm(edges, axis=1))) or 1e-6
+    size = mean_edge * np.sqrt(len(faces) / max(target_faces, 1))
+
+    fine, coarse = None, None    # (size, result) around the target
+    for _ in range(max_steps):
+        result = _cluster(vertices, faces, size, origin)
+        if len(result[2]) > target_faces:
+            fine = (size, result)
+        else:
+            coarse = (size, result)
+        if fine is None:
+            size /= 1.5
+        elif coarse is None:
+            size *= 1.5
+        else:
+            if fine[0] / coarse[0] > 0.98:
+                break
+            size = np.sqrt(fine[0] * coarse[0])
+
+    labels, n_cells, f = (coarse or fine)[1]
+    counts = np.bincount(labels, minlength=n_cells).astype(np.float64)
+    positions = np.stack([np.bincount(labels, weights=vertices[:, k], minlength=n_cells)
+                          for k in range(3)], axis=1) / np.maximum(counts, 1)[:, None]
+
+    used, local = np.unique(f, return_inverse=True)
+    return positions[used].astype(np.float32), local.reshape(-1, 3).astype(np.uint32)
+
+
+DECIMATORS = {'quadric': decimate_quadric, 'cluster': decimate_cluster}
+
+
+def decimate(vertices, faces, target_faces, method='quadric'):
+    """Decimate with the chosen method. Returns (vertices, faces, info)."""
+    start = time.perf_counter()
+    verts, tris = DECIMATORS[method](vertices, faces, target_faces)
+    info = {
+        'method': method,
+        'faces_before': len(faces),
+        'faces_after': len(tris),
+        'reduction': 1.0 - len(tris) / max(len(faces), 1),
+        'seconds': time.perf_counter() - start,
+    }
+    return verts, tris, info
+
+
+def info_header(info):
+    """STL header recording how the mesh was decimated."""
+    return (f"decimate-stl method={info['method']} faces={info['faces_before']}->{info['faces_after']} "
+            f"reduction={info['reduction']:.4f}").encode('ascii')
+
+
+# ─── PER-PART BUDGETS ───────────────────────────────────────────────────────────
+
+MIN_PART_FACES = 12           # never decimate a part below this
+
+
+def part_metrics(path):
+    """Face count, surface area, bbox diagonal and curvature of one STL part.
+
+    Curvature is the total dihedral angle along manifold edges, Σ θ·length,
+    divided by sqrt(area): a dimensionless measure that does not depend on
+    tessellation density (≈7 for a sphere, higher for fillets, holes and
+    thin sharp-edged features, ≈0 for a large flat plate interior).
+    """
+    vertices, faces = load_stl(path)
+    faces = faces.astype(np.int64)
+    tri = vertices[faces].astype(np.float64)
+    cross = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    area2 = np.linalg.norm(cross, axis=1)
+    unit = cross / np.maximum(area2, 1e-30)[:, None]
+    area = float(area2.sum() / 2)
+
+    # Pair the two faces of every manifold edge
+    a, b = faces.reshape(-1), faces[:, [1, 2, 0]].reshape(-1)
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    order = np.lexsort((hi, lo))
+    lo, hi = lo[order], hi[order]
+    same = (lo[1:] == lo[:-1]) & (hi[1:] == hi[:-1])
+    first = np.flatnonzero(same)
+    f1, f2 = order[first] // 3, order[first + 1] // 3
+    cos = np.clip(np.einsum('ij,ij->i', unit[f1], unit[f2]), -1.0, 1.0)
+    length = np.linalg.norm(vertices[lo[first]].astype(np.float64) - vertices[hi[first]], axis=1)
+    total_angle = float(np.sum(np.arccos(cos) * length))
+
+    return {
+        'path': path,
+        'faces': len(faces),
+        'area': area,
+        'diagonal': float(np.linalg.norm(np.ptp(vertices, axis=0))) if len(vertices) else 0.0,
+        'curvature': total_angle / max(np.sqrt(area), 1e-30),
+    }
+
+
+def importance(metrics):
+    """Relative detail a part deserves.
+
+    Sub-linear in area and size so small parts are not starved by large
+    plates, boosted by curvature so fillets and holes keep their faces.
+    """
+    return np.sqrt(metrics['area']) * np.sqrt(metrics['diagonal']) * (1.0 + metrics['curvature'] / 4.0)
+
+
+def allocate_budgets(parts, target_faces):
+    """Split target_faces by importance, capped at each part's own face count.
+
+    Water-filling: budget freed by parts that already fit is handed back to
+    the others in proportion to their importance. The sum never exceeds
+    target_faces (except for the MIN_PART_FACES floor).
+    """
+    n = len(parts)
+    have = np.array([p['faces'] for p in parts], dtype=np.float64)
+    weight = np.array([importance(p) for p in parts], dtype=np.float64) + 1e-12
+    budget = np.zeros(n)
+    open_ = np.ones(n, dtype=bool)
+    remaining = float(target_faces)
+
+    while open_.any() and remaining > 0.5:
+        share = remaining * weight * open_ / weight[open_].sum()
+        capped = open_ & (budget + share >= have)
+        if not capped.any():
+            budget += share
+            break
+        remaining -= float((have[capped] - budget[capped]).sum())
+        budget[capped] = have[capped]
+        open_ &= ~capped
+
+    floor = np.minimum(have, MIN_PART_FACES)
+    return np.maximum(np.floor(budget), floor).astype(np.int64)
+
+
+def decimated_path(path, out_dir=None):
+    """Output path: <name>_decimated.stl next to the input or inside out_dir."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(out_dir or os.path.dirname(os.path.abspath(path)), f"{stem}_decimated.stl")
+
+
+def output_paths(entries, out_dir=None):
+    """(input, output) pairs for every STL under entries.
+
+    With out_dir, each file keeps its path relative to the directory it was
+    found under, so parts with the same name in different folders do not
+    overwrite each other. Any remaining collision is an error.
+    """
+    pairs = []
+    for entry in entries:
+        root = entry if os.path.isdir(entry) else os.path.dirname(os.path.abspath(entry))
+        for path in collect_stl_paths([entry]):
+            if out_dir:
+                sub = os.path.dirname(os.path.relpath(os.path.abspath(path), os.path.abspath(root)))
+                out_path = decimated_path(path, os.path.join(out_dir, sub))
+            else:
+                out_path = decimated_path(path)
+            pairs.append((path, out_path))
+
+    seen = {}
+    for path, out_path in pairs:
+        key = os.path.normcase(os.path.abspath(out_path))
+        if key in seen:
+            print(f"[ERROR] {seen[key]} and {path} would both be written to {out_path}")
+            sys.exit(1)
+        seen[key] = path
+    return pairs
+
+
+def decimate_part(job):
+    """Worker: load one part, decimate it to its budget and save it."""
+    path, budget, out_path, method = job
+    vertices, faces = load_stl(path)
+    header = b'decimate-stl method=none'
+    if len(faces) > budget:
+        vertices, faces, info = decimate(vertices, faces, int(budget), method)
+        header = info_header(info)
+    save_stl(out_path, np.asarray(vertices, dtype=np.float32), np.asarray(faces), header)
+    return len(faces)
+
+
+def collect_stl_paths(entries):
+    paths = []
+    for entry in entries:
+        if os.path.isdir(entry):
+            paths.extend(sorted(glob.glob(os.path.join(entry, '**', '*.stl'), recursive=True)))
+        else:
+            paths.append(entry)
+    return [p for p in paths
+            if not p.endswith('_decimated.stl') and CACHE_DIR_NAME not in p.split(os.sep)]
+
+
+def decimate_parts(entries, target_faces, out_dir=None, jobs=None, method='quadric'):
+    """Decimate many parts against one shared face budget, in parallel."""
+    pairs = output_paths(entries, out_dir)
+    if not pairs:
+        print("No STL parts found.")
+        sys.exit(1)
+    paths = [path for path, _ in pairs]
+    outputs = [out_path for _, out_path in pairs]
+    for out_path in outputs:
+        os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        print(f"Measuring {len(paths)} part(s)...")
+        parts = list(pool.map(part_metrics, paths))
+        total = sum(p['faces'] for p in parts)
+        print(f"Original: {total:,} faces in {len(parts)} part(s), target {target_faces:,}")
+
+        budgets = allocate_budgets(parts, target_faces)
+        results = np.array(list(pool.map(decimate_part,
+                                         [(p, b, o, method) for p, b, o in zip(paths, budgets, outputs)])))
+
+        # Decimators land near, not exactly on, their target: shave the overshoot
+        for _ in range(3):
+            excess = int(results.sum()) - target_faces
+            over = results > budgets
+            if excess <= 0 or not over.any():
+                break
+            share = excess * (results - budgets) * over / max((results - budgets)[over].sum(), 1)
+            budgets = np.where(over, np.maximum(budgets - np.ceil(share).astype(np.int64), MIN_PART_FACES), budgets)
+            redo = np.flatnonzero(over)
+            jobs_redo = [(paths[i], budgets[i], outputs[i], method) for i in redo]
+            results[redo] = list(pool.map(decimate_part, jobs_redo))
+
+    print(f"\n{'part':<40} {'faces':>10} {'budget':>10} {'result':>10} {'curv':>6}")
+    for p, b, r in zip(parts, budgets, results):
+        print(f"{os.path.basename(p['path'])[:40]:<40} {p['faces']:>10,} {int(b):>10,} {int(r):>10,} "
+              f"{p['curvature']:>6.1f}")
+    print(f"{'TOTAL':<40} {total:>10,} {int(budgets.sum()):>10,} {int(results.sum()):>10,}")
+    print(f"Method: {method}, reduction {1.0 - results.sum() / max(total, 1):.4f}")
+    if results.sum() > target_faces:
+        print(f"[WARN] {int(results.sum()) - target_faces:,} faces over target "
+              f"(parts already at their {MIN_PART_FACES}-face floor)")
+
+
+# ─── BATCH MODE ─────────────────────────────────────────────────────────────────
+
+CACHE_DIR_NAME = '.decimate-cache'
+
+
+def file_digest(path, chunk=1 << 22):
+    """SHA-256 of a file's content, streamed."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(chunk):
+            h.update(block)
+    return h.hexdigest()
+
+
+def decimate_file(job):
+    """Worker: decimate one STL to target_faces through the result cache.
+
+    The result is copied to every path in out_paths (inputs with identical
+    content share one job). Returns one summary entry per output.
+    """
+    path, out_paths, target_faces, method, cache_dir, digest = job
+    start = time.perf_counter()
+    key = f"{digest}-{target_faces}-{method}"
+    cached_stl = os.path.join(cache_dir, key + '.stl')
+    cached_info = os.path.join(cache_dir, key + '.json')
+
+    if os.path.exists(cached_stl) and os.path.exists(cached_info):
+        with open(cached_info, encoding='utf-8') as f:
+            info = json.load(f)
+        cached = True
+    else:
+        vertices, faces = load_stl(path)
+        if len(faces) > target_faces:
+            vertices, faces, info = decimate(vertices, faces, target_faces, method)
+            header = info_header(info)
+        else:
+            info = {'method': 'none', 'faces_before': len(faces), 'faces_after': len(faces)}
+            header = b'decimate-stl method=none'
+        # Write under process-unique temporary names so concurrent runs never see half a file
+        tmp = f"{cached_stl}.{os.getpid()}.tmp"
+        save_stl(tmp, np.asarray(vertices, dtype=np.float32), np.asarray(faces), header)
+        os.replace(tmp, cached_stl)
+        tmp = f"{cached_info}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(tmp, cached_info)
+        cached = False
+
+    seconds = time.perf_counter() - start
+    results = []
+    for i, (src, out_path) in enumerate(out_paths):
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        shutil.copyfile(cached_stl, out_path)
+        results.append({
+            'path': src,
+            'faces_before': int(info['faces_before']),
+            'faces_after': int(info['faces_after']),
+            'seconds': seconds,
+            'bytes_saved': os.path.getsize(src) - os.path.getsize(out_path),
+            'cached': cached,
+            'duplicate': i > 0,
+        })
+    return results
+
+
+def decimate_batch(entries, target_faces, out_dir=None, jobs=None, method='quadric', cache_dir=None):
+    """Decimate every STL under the given directories/files, each to target_faces."""
+    pairs = output_paths(entries, out_dir)
+    if not pairs:
+        print("No STL files found.")
+        sys.exit(1)
+
+    cache_dir = cache_dir or os.path.join(out_dir or '.', CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    print(f"Decimating {len(pairs)} file(s) to ~{target_faces:,} faces ({method}), cache: {cache_dir}")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # Identical inputs share a cache key: decimate them once, copy to every output
+        groups = {}
+        for (path, out_path), digest in zip(pairs, pool.map(file_digest, [p for p, _ in pairs])):
+            groups.setdefault(digest, []).append((path, out_path))
+        jobs_list = [(outs[0][0], outs, target_faces, method, cache_dir, digest)
+                     for digest, outs in groups.items()]
+        results = [r for batch in pool.map(decimate_file, jobs_list) for r in batch]
+
+    print(f"\n{'file':<40} {'before':>10} {'after':>10} {'time':>7} {'saved MB':>9}")
+    for r in results:
+        took = 'dup' if r['duplicate'] else 'cached' if r['cached'] else f"{r['seconds']:.1f}s"
+        print(f"{os.path.basename(r['path'])[:40]:<40} {r['faces_before']:>10,} {r['faces_after']:>10,} "
+              f"{took:>7} {r['bytes_saved'] / (1024 * 1024):>9.2f}")
+    hits = sum(r['cached'] for r in results if not r['duplicate'])
+    print(f"{'TOTAL':<40} {sum(r['faces_before'] for r in results):>10,} "
+          f"{sum(r['faces_after'] for r in results):>10,} {time.perf_counter() - start:>6.1f}s "
+          f"{sum(r['bytes_saved'] for r in results) / (1024 * 1024):>9.2f}")
+    print(f"Cache: {hits}/{len(jobs_list)} hit(s), {len(results) - len(jobs_list)} duplicate input(s)")
+
+
+# ─── MAIN ───────────────────────────────────────────────────────────────────────
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Decimate STL meshes for WebGL rendering")
+    parser.add_argument("input", nargs="?", default=r"d:\MPEB\models\roller-h125.stl", help="Input STL")
+    parser.add_argument("target_faces", nargs="?", type=int, default=200000, help="Target face count")
+    parser.add_argument("--parts", nargs="+", metavar="STL_OR_DIR",
+                        help="Per-part mode: split the face budget across these STLs/directories")
+    parser.add_argument("--batch", nargs="+", metavar="STL_OR_DIR",
+                        help="Batch mode: decimate every STL under these directories to the target, cached")
+    parser.add_argument("--cache-dir", default=None,
+                        help=f"Batch result cache (default: <out-dir>/{CACHE_DIR_NAME})")
+    parser.add_argument("--target", type=int, default=None, help="Target face count (overrides the positional)")
+    parser.add_argument("--out-dir", default=None, help="Output directory (default: next to each input)")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--method", choices=sorted(DECIMATORS), default="quadric",
+                        help="quadric (best quality) or cluster (fast grid clustering for huge meshes)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    target_faces = args.target or args.target_faces
+
+    if args.parts:
+        decimate_parts(args.parts, target_faces, args.out_dir, args.jobs, args.method)
+        return
+    if args.batch:
+        decimate_batch(args.batch, target_faces, args.out_dir, args.jobs, args.method, args.cache_dir)
+        return
+
+    input_path = args.input
+    output_path = decimated_path(input_path, args.out_dir)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    print(f"Loading STL: {input_path}")
+    vertices, faces = load_stl(input_path)
+    print(f"Original: {len(faces):,} faces, {len(vertices):,} vertices")
+    print(f"File size: {os.path.getsize(input_path) / 1024 / 1024:.1f} MB")
+
+    if len(faces) <= target_faces:
+        print(f"Already under {target_faces:,} faces, skipping.")
+        sys.exit(0)
+
+    ratio = 1.0 - (target_faces / len(faces))
+    print(f"\nDecimating to ~{target_faces:,} faces (reduction: {ratio:.4f}, method: {args.method})...")
+
+    verts, tris, info = decimate(vertices, faces, target_faces, args.method)
+    print(f"Result: {len(tris):,} faces, {len(verts):,} vertices")
+    print(f"Method: {info['method']}, measured reduction {info['reduction']:.4f} in {info['seconds']:.1f}s")
+
+    save_stl(output_path, np.asarray(verts, dtype=np.float32), np.asarray(tris), info_header(info))
+    size_mb = os.path.getsize(output_path) / 1024 / 1024
+    print(f"Saved: {output_path} ({size_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,194 @@
-from PIL import Image
+"""Convert extracted JPX images to responsive WebP/AVIF variants for the site.
+
+Each source gets one file per (width, format), never wider than the source,
+plus a manifest.json describing every variant (path, format, width, height,
+bytes) for the Next.js <Image>/srcset markup. Sources are converted on a
+process pool; a source whose variants are all newer than it is skipped.
+
+JPEG 2000 sources are decoded at the smallest resolution level that still
+covers the widest variant (each level halves the size), so thumbnail and
+preview runs never decode the full-resolution scan.
+
+Usage:
+  python convert-images.py [--src DIR] [--out DIR] [--widths 480 960 1600] [--formats webp avif]
+"""
+import argparse
+import json
 import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, features
+
+DEFAULT_SRC = r"d:\MPEB\scripts\pdf-extract"
+DEFAULT_WIDTHS = [480, 960, 1600]
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 6},
+    'avif': {'quality': 60, 'speed': 6},
+}
+
+
+def variant_widths(width, widths):
+    """srcset widths for a source: the requested ones it can fill, or its own width."""
+    return sorted({w for w in widths if w < width} | {min(width, max(widths))})
+
 
-src = r"d:\MPEB\scripts\pdf-extract"
-for f in os.listdir(src):
-    if f.endswith('.jpx'):
+def _codestream_offset(f):
+    """Offset of the JPEG 2000 codestream: 0 for a raw .j2c, the jp2c box payload in a JP2."""
+    f.seek(0)
+    if f.read(2) == b'\xff\x4f':
+        return 0
+    pos = 0
+    while True:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        length, box = struct.unpack('>I4s', header)
+        start = pos + 8
+        if length == 1:
+            length = struct.unpack('>Q', f.read(8))[0]
+            start += 8
+        if box == b'jp2c':
+            return start
+        if length == 0 or length < start - pos:
+            return None
+        pos += length
+
+
+def jpx_levels(path):
+    """Number of wavelet decomposition levels, from the codestream's COD marker.
+
+    The JP2 boxes (colr, xml, uuid...) are skipped to reach the codestream,
+    whose main header segments are then read in order up to COD.
+    """
+    with open(path, 'rb') as f:
+        start = _codestream_offset(f)
+        if start is None:
+            return 0
+        f.seek(start)
+        if f.read(2) != b'\xff\x4f':    # SOC
+            return 0
+        while True:
+            marker = f.read(4)
+            if len(marker) < 4 or marker[0] != 0xFF:
+                return 0
+            code, length = marker[1], struct.unpack('>H', marker[2:])[0]
+            if code == 0x52:    # COD: Scod, progression, layers (2), MCT, levels
+                body = f.read(length - 2)
+                return body[5] if len(body) > 5 else 0
+            if code == 0x90 or length < 2:    # first tile part: no COD in the main header
+                return 0
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def open_for_width(src_path, width):
+    """Open and load src_path, JPEG 2000 at the coarsest level at least `width` wide."""
+    img = Image.open(src_path)
+    if img.format != 'JPEG2000':
+        img.load()
+        return img
+    full_width = img.size[0]
+    level = 0
+    while level < jpx_levels(src_path) and -(-full_width // (2 << level)) >= width:
+        level += 1
+    # Some codestreams refuse a given level; fall back towards full resolution
+    for reduce in range(level, -1, -1):
+        img = Image.open(src_path)
+        img.reduce = reduce
         try:
-            img = Image.open(os.path.join(src, f))
-            out = os.path.join(src, f.replace('.jpx', '.png'))
-            img.save(out)
-            print(f"Converted: {f} -> {os.path.basename(out)} ({img.size[0]}x{img.size[1]})")
-        except Exception as e:
-            print(f"Failed: {f} - {e}")
+            img.load()
+            return img
+        except OSError:
+            img.close()
+    raise OSError(f"cannot decode {src_path}")
+
+
+def variant_path(out_dir, name, width, fmt):
+    return os.path.join(out_dir, f"{name}-{width}w.{fmt}")
+
+
+def up_to_date(src_path, outputs):
+    mtime = os.path.getmtime(src_path)
+    return all(os.path.exists(p) and os.path.getmtime(p) >= mtime for p in outputs)
+
+
+def describe(path, fmt):
+    with Image.open(path) as img:
+        w, h = img.size
+    return {'path': os.path.basename(path), 'format': fmt, 'width': w, 'height': h,
+            'bytes': os.path.getsize(path)}
+
+
+def convert(job):
+    """Worker: write every variant of one source, unless they are all up to date."""
+    src_path, out_dir, widths, formats = job
+    name = os.path.splitext(os.path.basename(src_path))[0]
+    start = time.perf_counter()
+    with Image.open(src_path) as img:
+        size = img.size
+        targets = [(w, fmt, variant_path(out_dir, name, w, fmt))
+                   for w in variant_widths(size[0], widths) for fmt in formats]
+        skipped = up_to_date(src_path, [p for _, _, p in targets])
+    if not skipped:
+        with open_for_width(src_path, max(w for w, _, _ in targets)) as img:
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+            for w, fmt, path in targets:
+                h = max(1, round(size[1] * w / size[0]))
+                resized = img if img.size == (w, h) else img.resize((w, h), Image.LANCZOS)
+                resized.save(path, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+
+    return name, {
+        'source': os.path.basename(src_path),
+        'width': size[0],
+        'height': size[1],
+        'variants': [describe(path, fmt) for _, fmt, path in targets],
+    }, skipped, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert JPX images to responsive WebP/AVIF variants")
+    parser.add_argument("--src", default=DEFAULT_SRC, help="Directory holding the .jpx files")
+    parser.add_argument("--out", default=None, help="Output directory (default: <src>/web)")
+    parser.add_argument("--widths", type=int, nargs="+", default=DEFAULT_WIDTHS, help="srcset widths")
+    parser.add_argument("--formats", nargs="+", choices=sorted(SAVE_OPTIONS), default=["webp", "avif"])
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    out_dir = args.out or os.path.join(args.src, "web")
+    os.makedirs(out_dir, exist_ok=True)
+    formats = [f for f in args.formats if features.check(f)]
+    for f in set(args.formats) - set(formats):
+        print(f"Skipping {f}: not supported by this Pillow build")
+
+    sources = sorted(os.path.join(args.src, f) for f in os.listdir(args.src) if f.lower().endswith('.jpx'))
+    jobs = [(path, out_dir, args.widths, formats) for path in sources]
+
+    manifest = {}
+    converted = skipped = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [(job, pool.submit(convert, job)) for job in jobs]
+        for job, future in futures:
+            try:
+                name, entry, was_skipped, elapsed = future.result()
+            except Exception as e:
+                print(f"Failed: {os.path.basename(job[0])} - {e}")
+                continue
+            manifest[name] = entry
+            if was_skipped:
+                skipped += 1
+                continue
+            converted += 1
+            total = sum(v['bytes'] for v in entry['variants'])
+            print(f"Converted: {entry['source']} ({entry['width']}x{entry['height']}) -> "
+                  f"{len(entry['variants'])} variants, {total / 1024:.0f} KB in {elapsed:.1f}s")
+
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"\n{converted} converted, {skipped} up to date, manifest: {manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
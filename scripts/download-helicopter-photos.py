@@ -1,12 +1,10 @@
 import os
-import time
-import urllib.request
-import urllib.parse
-import json
-import ssl
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from wikimedia_fetch import CACHE_FILE, Fetcher, MetadataCache, api_url, download_conditional
 
 output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'public', 'images', 'aerotools', 'helicopters')
-os.makedirs(output_dir, exist_ok=True)
 
 # Each model has a specific Wikimedia Commons search query to find the right helicopter
 models = [
@@ -32,31 +30,19 @@ models = [
     {"id": "aw119",   "query": "AgustaWestland AW119 Koala helicopter"},
 ]
 
-ctx = ssl.create_default_context()
-ctx.check_hostname = False
-ctx.verify_mode = ssl.CERT_NONE
-
-def search_wikimedia(query):
+def search_wikimedia(fetcher, query, api=None):
     """Search Wikimedia Commons for images matching the query."""
-    params = urllib.parse.urlencode({
+    data = fetcher.get_json(api_url({
         'action': 'query',
         'generator': 'search',
         'gsrsearch': f'File: {query}',
         'gsrlimit': '5',
         'gsrnamespace': '6',
         'prop': 'imageinfo',
-        'iiprop': 'url|size|mime',
+        'iiprop': 'url|size|mime|sha1',
         'iiurlwidth': '1024',
         'format': 'json',
-    })
-    url = f'https://commons.wikimedia.org/w/api.php?{params}'
-    
-    req = urllib.request.Request(url, headers={
-        'User-Agent': 'LledoAerotoolsBot/1.0 (webmaster@mpeb13.com)',
-    })
-    
-    with urllib.request.urlopen(req, context=ctx) as response:
-        data = json.loads(response.read().decode())
+    }, api))
     
     pages = data.get('query', {}).get('pages', {})
     
@@ -71,60 +57,78 @@ def search_wikimedia(query):
                 'url': thumb_url,
                 'width': width,
                 'title': page.get('title', ''),
+                # The API hash is the original file's: useless for a thumbnail
+                'sha1': imageinfo.get('sha1') if thumb_url == imageinfo.get('url') else None,
             })
     
     # Sort by width descending (prefer larger images)
     results.sort(key=lambda x: x['width'], reverse=True)
     return results
 
-def download_image(url, filepath):
-    """Download an image from a URL to a file."""
-    req = urllib.request.Request(url, headers={
-        'User-Agent': 'LledoAerotoolsBot/1.0 (webmaster@mpeb13.com)',
-    })
-    with urllib.request.urlopen(req, context=ctx) as response:
-        with open(filepath, 'wb') as f:
-            f.write(response.read())
+def fetch_model(fetcher, cache, model, out_dir, api=None, search_ttl=0):
+    """Search + download for one model; returns (ok, log lines)."""
+    filepath = os.path.join(out_dir, f"{model['id']}.jpg")
+    lines = [f"Recherche pour {model['id']} : '{model['query']}'..."]
+    try:
+        results, cached = cache.search(f"download:{model['query']}", search_ttl,
+                                       lambda: search_wikimedia(fetcher, model['query'], api))
+        if cached:
+            lines.append("  (recherche en cache)")
+        if not results:
+            lines.append(f"  ❌ Aucune image trouvée pour {model['id']}")
+            return False, lines
+
+        # Take the first (largest) result
+        best = results[0]
+        lines.append(f"  Téléchargement : {best['title']} ({best['width']}px)")
+        if not download_conditional(fetcher, cache, best['url'], best['title'], filepath, best.get('sha1')):
+            lines.append("  ✅ Inchangé (304)")
+            return True, lines
+
+        size = os.path.getsize(filepath)
+        lines.append(f"  ✅ Sauvegardé : {filepath} ({size} octets)")
+        return True, lines
+    except Exception as e:
+        lines.append(f"  ❌ Erreur pour {model['id']}: {str(e)}")
+        return False, lines
 
 def main():
+    parser = argparse.ArgumentParser(description="Télécharge les photos d'hélicoptères depuis Wikimedia Commons")
+    parser.add_argument("--workers", type=int, default=4, help="Téléchargements simultanés")
+    parser.add_argument("--rate", type=float, default=4.0, help="Requêtes par seconde (toutes connexions)")
+    parser.add_argument("--api-url", default=None, help="URL de l'API (serveur de test local)")
+    parser.add_argument("--output-dir", default=output_dir, help="Dossier de sortie")
+    parser.add_argument("--cache", default=CACHE_FILE, help="Fichier de cache (ETag, recherches)")
+    parser.add_argument("--search-ttl", type=float, default=168, help="Durée de validité des recherches (heures)")
+    args = parser.parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
+
     print("Téléchargement des images d'hélicoptères depuis Wikimedia Commons...")
-    print(f"Dossier de sortie : {output_dir}\n")
+    print(f"Dossier de sortie : {args.output_dir}\n")
     
     success = 0
     failed = []
-    
-    for model in models:
-        filepath = os.path.join(output_dir, f"{model['id']}.jpg")
-        print(f"Recherche pour {model['id']} : '{model['query']}'...")
-        
-        try:
-            results = search_wikimedia(model['query'])
-            
-            if not results:
-                print(f"  ❌ Aucune image trouvée pour {model['id']}")
-                failed.append(model['id'])
-                continue
-            
-            # Take the first (largest) result
-            best = results[0]
-            print(f"  Téléchargement : {best['title']} ({best['width']}px)")
-            download_image(best['url'], filepath)
-            
-            size = os.path.getsize(filepath)
-            print(f"  ✅ Sauvegardé : {filepath} ({size} octets)")
-            success += 1
-            
-        except Exception as e:
-            print(f"  ❌ Erreur pour {model['id']}: {str(e)}")
-            failed.append(model['id'])
-        
-        time.sleep(1)  # Be nice to the API
+    fetcher = Fetcher(rate=args.rate, burst=args.workers)
+    cache = MetadataCache(args.cache)
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            outcomes = pool.map(lambda m: fetch_model(fetcher, cache, m, args.output_dir, args.api_url,
+                                                      args.search_ttl * 3600), models)
+            for model, (ok, lines) in zip(models, outcomes):
+                print("\n".join(lines))
+                if ok:
+                    success += 1
+                else:
+                    failed.append(model['id'])
+    finally:
+        fetcher.close()
+        cache.save()
     
     print(f"\n{'='*60}")
     print(f"Résultat : {success}/{len(models)} images téléchargées")
     if failed:
         print(f"Échecs : {', '.join(failed)}")
-    print(f"Dossier : {output_dir}")
+    print(f"Dossier : {args.output_dir}")
 
 if __name__ == "__main__":
     main()
@@ -1,35 +1,262 @@
-import pdfplumber
+"""Extract text, tables and images from a catalogue PDF in one pass.
+
+Pages are handed to a pool of worker processes. Each worker opens the
+document once and, for each page it gets, pulls the text, the tables and
+the embedded images with PyMuPDF. Every finished page is appended to
+pages.jsonl straight away, so memory does not grow with the document and a
+crash keeps everything extracted so far. --resume skips the pages already
+in pages.jsonl. all-text.txt and image-map.json are rebuilt from it at the
+end.
+
+Images are deduplicated across the document: the image lists of all pages
+are read first (cheap, nothing is decoded) and each xref is extracted once,
+by the first selected page that shows it. Files are named by content hash,
+so distinct xrefs holding the same bytes share one file. image-map.json
+maps pages to image files and back.
+
+JPEG, JPEG 2000 and JBIG2 images are written as their original encoded
+stream bytes, without decoding. JBIG2 follows the pdfimages convention: an
+embedded .jb2e stream plus its .jb2g globals. Only other filters, filter
+chains and images with a /Decode remap are decoded (to PNG).
+
+Usage:
+  python extract-pdf.py [catalogue.pdf] [--out-dir DIR] [--workers N] [--pages 1-50,75,300-] [--resume]
+
+Output (in --out-dir):
+  pages.jsonl             one {"page", "text", "tables", "images", "new_images"} line per page
+  all-text.txt            text of the extracted pages, in order
+  image-map.json          {"pages": {page: [file]}, "images": {file: {...}}}
+  img_{hash}_{w}x{h}.{ext}       unique embedded images above --min-size
+                                 (jpg/jpx/jb2e raw, png when decoded)
+"""
+import argparse
+import hashlib
 import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pymupdf  # PyMuPDF
 
-pdf_path = r"d:\MPEB\Page 340-349 - Catalogue Solutions Aéronautiques 2026 FR (003).pdf"
-
-with pdfplumber.open(pdf_path) as pdf:
-    print(f"=== PDF: {len(pdf.pages)} pages ===\n")
-    
-    for i, page in enumerate(pdf.pages):
-        print(f"\n{'='*60}")
-        print(f"PAGE {i+1} (PDF page {page.page_number})")
-        print(f"{'='*60}")
-        
-        # Extract text
-        text = page.extract_text()
-        if text:
-            print(text)
+DEFAULT_PDF = r"d:\MPEB\Page 340-349 - Catalogue Solutions Aéronautiques 2026 FR (003).pdf"
+DEFAULT_OUT = r"d:\MPEB\scripts\pdf-extract"
+RAW_FILTERS = {'DCTDecode': 'jpg', 'JPXDecode': 'jpx', 'JBIG2Decode': 'jb2e'}
+
+_doc = None    # the worker's open document
+
+
+def parse_pages(spec, n_pages):
+    """'1-50,75,300-' -> sorted 0-based page indices (1-based, inclusive ranges)."""
+    if not spec:
+        return list(range(n_pages))
+    pages = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if '-' in part:
+            a, b = part.split('-', 1)
+            first, last = int(a or 1), int(b or n_pages)
         else:
-            print("[No text extracted]")
-        
-        # Extract tables
-        tables = page.extract_tables()
-        if tables:
-            for j, table in enumerate(tables):
-                print(f"\n--- TABLE {j+1} ---")
-                for row in table:
-                    print(" | ".join([str(cell) if cell else "" for cell in row]))
-        
-        # List images
-        images = page.images
-        if images:
-            print(f"\n--- {len(images)} IMAGES on this page ---")
-            for k, img in enumerate(images):
-                print(f"  Image {k+1}: x0={img['x0']:.0f}, y0={img['top']:.0f}, w={img['width']:.0f}, h={img['height']:.0f}")
+            first = last = int(part)
+        pages.update(range(max(first, 1) - 1, min(last, n_pages)))
+    return sorted(pages)
+
+
+def read_done(jsonl_path):
+    """Pages already in pages.jsonl; a torn last line from a crash is cut off."""
+    done = set()
+    if not os.path.exists(jsonl_path):
+        return done
+    good = 0
+    with open(jsonl_path, 'rb') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["page"])
+            except (ValueError, KeyError):
+                break
+            good += len(line)
+    with open(jsonl_path, 'r+b') as f:
+        f.truncate(good)
+    return done
+
+
+def scan_images(pdf_path, min_size):
+    """Per-page (xref, width, height) of images above min_size, from the page resources only."""
+    with pymupdf.open(pdf_path) as doc:
+        return [[(info[0], info[2], info[3]) for info in page.get_images(full=True)
+                 if info[2] > min_size and info[3] > min_size]
+                for page in doc]
+
+
+def _ref_xref(doc, xref, key):
+    kind, value = doc.xref_get_key(xref, key)
+    return int(value.split()[0]) if kind == 'xref' else None
+
+
+def raw_stream(doc, xref):
+    """(encoded bytes, ext, jbig2 globals) if the stream is usable as-is, else None."""
+    kind, value = doc.xref_get_key(xref, "Filter")
+    if kind == 'name':
+        filters = [value]
+    elif kind == 'array':
+        filters = value.strip('[]').split()
+    else:
+        return None
+    filters = [f.lstrip('/') for f in filters]
+    if len(filters) != 1 or filters[0] not in RAW_FILTERS:
+        return None
+    if doc.xref_get_key(xref, "Decode")[0] != 'null':
+        return None  # remapped samples: the raw codestream would show the wrong colours
+
+    globals_data = None
+    if filters[0] == 'JBIG2Decode':
+        globals_xref = _ref_xref(doc, xref, "DecodeParms/JBIG2Globals")
+        if globals_xref:
+            globals_data = doc.xref_stream(globals_xref)
+    return doc.xref_stream_raw(xref), RAW_FILTERS[filters[0]], globals_data
+
+
+def _write_once(path, data):
+    try:
+        # Exclusive create: another worker may have written the same bytes
+        with open(path, "xb") as f:
+            f.write(data)
+    except FileExistsError:
+        pass
+
+
+def save_image(doc, xref, w, h, out_dir):
+    """Write one xref to a content-addressed file; returns its metadata."""
+    raw = raw_stream(doc, xref)
+    if raw is not None:
+        data, ext, globals_data = raw
+        encoding = "raw"
+    else:
+        base_image = doc.extract_image(xref)
+        data, ext, globals_data = base_image["image"], base_image["ext"], None
+        w, h = base_image["width"], base_image["height"]
+        encoding = "decoded"
+
+    stem = f"img_{hashlib.sha1(data).hexdigest()[:16]}_{w}x{h}"
+    _write_once(os.path.join(out_dir, f"{stem}.{ext}"), data)
+    meta = {"file": f"{stem}.{ext}", "width": w, "height": h, "bytes": len(data), "encoding": encoding}
+    if globals_data:
+        _write_once(os.path.join(out_dir, f"{stem}.jb2g"), globals_data)
+        meta["globals"] = f"{stem}.jb2g"
+    return meta
+
+
+def extract_page(page, xrefs, owned, out_dir):
+    """Text and tables of one page, plus the images this page is first to show."""
+    text = page.get_text()
+    tables = [table.extract() for table in page.find_tables().tables]
+
+    images = {}
+    for xref, w, h in xrefs:
+        if xref not in owned or str(xref) in images:
+            continue
+        try:
+            images[str(xref)] = save_image(_doc, xref, w, h, out_dir)
+        except Exception as e:
+            print(f"Error page {page.number + 1} xref {xref}: {e}")
+
+    return {"page": page.number + 1, "text": text, "tables": tables,
+            "images": [xref for xref, _, _ in xrefs], "new_images": images}
+
+
+def open_document(pdf_path):
+    """Worker initializer: open the PDF once per process."""
+    global _doc
+    _doc = pymupdf.open(pdf_path)
+
+
+def extract_job(job):
+    page_idx, xrefs, owned, out_dir = job
+    return extract_page(_doc[page_idx], xrefs, owned, out_dir)
+
+
+def finish_outputs(out_dir, jsonl_path, page_xrefs):
+    """Rebuild all-text.txt and image-map.json from pages.jsonl, one page at a time."""
+    offsets, xref_images = {}, {}
+    with open(jsonl_path, 'rb') as f:
+        offset = 0
+        for line in f:
+            record = json.loads(line)
+            offsets[record["page"]] = offset
+            xref_images.update(record["new_images"])
+            offset += len(line)
+
+    with open(jsonl_path, 'rb') as src, open(os.path.join(out_dir, "all-text.txt"), "w", encoding="utf-8") as out:
+        for page_no in sorted(offsets):
+            src.seek(offsets[page_no])
+            text = json.loads(src.readline())["text"].strip() or "[No text]"
+            out.write(f"\n=== PAGE {page_no} ===\n{text}\n")
+
+    pages, files = {}, {}
+    for page_no in sorted(offsets):
+        names = []
+        for xref, _, _ in page_xrefs[page_no - 1]:
+            meta = xref_images.get(str(xref))
+            if meta is None:
+                continue
+            entry = files.setdefault(meta["file"], dict(meta, xrefs=[], pages=[]))
+            if xref not in entry["xrefs"]:
+                entry["xrefs"].append(xref)
+            if page_no not in entry["pages"]:
+                entry["pages"].append(page_no)
+            names.append(meta["file"])
+        pages[str(page_no)] = names
+    with open(os.path.join(out_dir, "image-map.json"), "w", encoding="utf-8") as f:
+        json.dump({"pages": pages, "images": files}, f, indent=1)
+    return len(offsets), files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract text, tables and images from a catalogue PDF")
+    parser.add_argument("pdf", nargs="?", default=DEFAULT_PDF, help="Input PDF")
+    parser.add_argument("--out-dir", default=DEFAULT_OUT, help="Output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--min-size", type=int, default=60, help="Skip images this size or smaller (px)")
+    parser.add_argument("--pages", default=None, help="Page selection, e.g. 1-50,75,300- (1-based)")
+    parser.add_argument("--resume", action="store_true", help="Skip pages already in pages.jsonl")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    jsonl_path = os.path.join(args.out_dir, "pages.jsonl")
+    start = time.perf_counter()
+    page_xrefs = scan_images(args.pdf, args.min_size)
+    selected = parse_pages(args.pages, len(page_xrefs))
+
+    # Ownership is computed over the whole selection so a resumed run agrees with the first one
+    first_page = {}
+    for page_idx in selected:
+        for xref, _, _ in page_xrefs[page_idx]:
+            first_page.setdefault(xref, page_idx)
+
+    done = read_done(jsonl_path) if args.resume else set()
+    if not args.resume:
+        open(jsonl_path, 'w').close()
+    todo = [i for i in selected if i + 1 not in done]
+    print(f"=== PDF: {len(page_xrefs)} pages, {len(selected)} selected, {len(todo)} to extract, "
+          f"{len(first_page)} unique image xref(s), {args.workers} worker(s) ===")
+
+    jobs = [(i, page_xrefs[i], {x for x, _, _ in page_xrefs[i] if first_page[x] == i}, args.out_dir)
+            for i in todo]
+    n_tables = 0
+    with open(jsonl_path, 'a', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=open_document, initargs=(args.pdf,)) as pool:
+        for future in as_completed([pool.submit(extract_job, job) for job in jobs]):
+            record = future.result()
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            n_tables += len(record["tables"])
+            print(f"Page {record['page']}: {len(record['text'])} chars, {len(record['tables'])} table(s), "
+                  f"{len(record['images'])} image(s), {len(record['new_images'])} new")
+
+    n_pages, files = finish_outputs(args.out_dir, jsonl_path, page_xrefs)
+    n_decoded = sum(meta["encoding"] == "decoded" for meta in files.values())
+    print(f"\nTotal: {n_pages} pages ({len(todo)} this run), {n_tables} new tables, {len(files)} unique image(s) "
+          f"({n_decoded} decoded) in {time.perf_counter() - start:.1f}s -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
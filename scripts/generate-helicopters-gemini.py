@@ -1,24 +1,54 @@
 """
 Script de génération d'images d'hélicoptères via l'API Gemini (Google AI).
 Génère 20 images d'hélicoptères devant un hangar bleu LLEDO.
+
+Les requêtes partent en parallèle (--concurrency) via un ordonnanceur
+adaptatif : un 429 divise la concurrence par deux et met tous les workers
+en pause pendant Retry-After ; chaque série de succès la fait remonter.
+Les nouvelles tentatives (429, 5xx, erreurs réseau) ont un backoff
+exponentiel avec jitter. --api-base (ou GEMINI_API_BASE) pointe vers un
+serveur local pour les tests.
+
+Chaque image générée est gardée dans un cache adressé par contenu
+(scripts/.gemini-cache), clé = SHA-256 de (modèle, prompt, config). Une
+requête identique ne repart jamais vers l'API, même si le fichier de sortie
+a été supprimé ; modifier generate_prompt n'invalide que les modèles dont
+le prompt a changé. --adopt-existing enregistre les images déjà présentes
+comme résultat du prompt actuel (pour ne pas tout repayer à la migration),
+si elles font au moins 10 Ko et que Pillow les lit sans erreur.
 """
 
 import os
 import time
 import base64
+import hashlib
 import json
+import random
+import argparse
+import threading
+import urllib.error
 import urllib.request
 import urllib.parse
 import ssl
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Configuration
 BASE_DIR = Path(__file__).parent.parent
 OUTPUT_DIR = BASE_DIR / "public" / "images" / "aerotools" / "helicopters" / "gemini"
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # Clé API depuis l'environnement ou en dur (pour test)
 API_KEY = os.environ.get("GEMINI_API_KEY", "")
+API_BASE = os.environ.get("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+MODEL = "imagen-4.0-generate-001"
+IMAGE_CONFIG = {
+    "numberOfImages": 1,
+    "aspectRatio": "16:9",
+    "outputMimeType": "image/png",
+}
+CACHE_DIR = BASE_DIR / "scripts" / ".gemini-cache"
+MIN_ADOPT_BYTES = 10 * 1024  # en dessous : fichier vide, tronqué ou page d'erreur
+RETRY_STATUSES = {429, 500, 502, 503, 504}
 
 # Liste des 20 modèles d'hélicoptères
 HELICOPTERS = [
@@ -70,19 +100,15 @@ Do NOT include any text, watermarks, or logos on the image."""
     return prompt
 
 
-def call_imagen_api(prompt):
+def call_imagen_api(prompt, api_base=API_BASE):
     """Appelle l'API Imagen 4.0 pour générer une image."""
     
     # Endpoint pour Imagen 4.0
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/imagen-4.0-generate-001:generateImages?key={API_KEY}"
+    url = f"{api_base}/v1beta/models/{MODEL}:generateImages?key={API_KEY}"
     
     payload = {
         "prompt": prompt,
-        "config": {
-            "numberOfImages": 1,
-            "aspectRatio": "16:9",
-            "outputMimeType": "image/png"
-        }
+        "config": IMAGE_CONFIG,
     }
     
     data = json.dumps(payload).encode("utf-8")
@@ -131,73 +157,232 @@ def extract_image_from_response(response):
         return None
 
 
-def save_image(image_data, filepath):
-    """Sauvegarde l'image décodée en base64."""
-    raw = base64.b64decode(image_data["data"])
-    with open(filepath, "wb") as f:
-        f.write(raw)
+def save_image(raw, filepath):
+    """Écrit l'image (octets décodés) de façon atomique."""
+    tmp = filepath.with_name(filepath.name + ".tmp")
+    tmp.write_bytes(raw)
+    os.replace(tmp, filepath)
     return len(raw)
 
 
+def cache_key(prompt, model=MODEL, config=IMAGE_CONFIG):
+    """Clé de cache : SHA-256 du modèle, du prompt et de la config de génération."""
+    blob = json.dumps({"model": model, "prompt": prompt, "config": config}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def adoptable(filepath):
+    """Raison du refus si filepath n'est pas une image complète, sinon None."""
+    size = filepath.stat().st_size
+    if size < MIN_ADOPT_BYTES:
+        return f"trop petit ({size} octets)"
+    from PIL import Image
+
+    try:
+        with Image.open(filepath) as img:
+            img.verify()
+    except Exception as e:
+        return f"image illisible ({e})"
+    return None
+
+
+class GenerationCache:
+    """Images générées (octets décodés) + métadonnées, indexées par cache_key."""
+
+    def __init__(self, directory):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key):
+        image, meta = self.dir / f"{key}.img", self.dir / f"{key}.json"
+        if image.exists() and meta.exists():
+            return image.read_bytes()
+        return None
+
+    def put(self, key, raw, prompt, mime_type, **extra):
+        save_image(raw, self.dir / f"{key}.img")
+        meta = {"model": MODEL, "prompt": prompt, "config": IMAGE_CONFIG, "mime_type": mime_type,
+                "bytes": len(raw), "created": time.strftime("%Y-%m-%dT%H:%M:%S"), **extra}
+        save_image(json.dumps(meta, ensure_ascii=False, indent=1).encode("utf-8"), self.dir / f"{key}.json")
+
+
+class AdaptiveLimiter:
+    """Limite de requêtes simultanées qui s'adapte aux 429 (AIMD).
+
+    Un 429 divise la limite par deux et bloque les nouveaux départs jusqu'à
+    la fin du Retry-After ; `limit` succès consécutifs l'augmentent de 1,
+    jusqu'au maximum configuré.
+    """
+
+    def __init__(self, max_concurrency):
+        self.max = max(1, max_concurrency)
+        self.limit = self.max
+        self.active = 0
+        self.successes = 0
+        self.resume_at = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                wait = self.resume_at - time.monotonic()
+                if wait <= 0 and self.active < self.limit:
+                    self.active += 1
+                    return
+                self.cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, ok):
+        with self.cond:
+            self.active -= 1
+            if ok:
+                self.successes += 1
+                if self.successes >= self.limit and self.limit < self.max:
+                    self.limit += 1
+                    self.successes = 0
+            self.cond.notify_all()
+
+    def throttle(self, delay):
+        with self.cond:
+            self.limit = max(1, self.limit // 2)
+            self.successes = 0
+            self.resume_at = max(self.resume_at, time.monotonic() + delay)
+            self.cond.notify_all()
+
+
+def retry_delay(attempt, retry_after=None, base=2.0, cap=60.0):
+    """Retry-After s'il est fourni (+ jitter), sinon backoff exponentiel « full jitter »."""
+    if retry_after:
+        try:
+            return float(retry_after) * random.uniform(1.0, 1.25)
+        except ValueError:
+            pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def generate_one(heli, prompt, filepath, cache, limiter, args, log):
+    """Génère une image avec nouvelles tentatives ; renvoie True si sauvegardée."""
+    for attempt in range(args.retries + 1):
+        limiter.acquire()
+        ok = False
+        try:
+            response = call_imagen_api(prompt, args.api_base)
+            ok = True
+        except urllib.error.HTTPError as e:
+            error_body = e.read().decode(errors="replace") if e.fp else ""
+            if e.code not in RETRY_STATUSES or attempt == args.retries:
+                log(f"❌ Erreur HTTP {e.code}: {error_body[:200]}")
+                return False
+            delay = retry_delay(attempt, e.headers.get("Retry-After"))
+            if e.code == 429:
+                limiter.throttle(delay)
+            log(f"↻ HTTP {e.code}, nouvel essai dans {delay:.1f}s")
+        except (urllib.error.URLError, OSError) as e:
+            if attempt == args.retries:
+                log(f"❌ Erreur: {e}")
+                return False
+            delay = retry_delay(attempt)
+            log(f"↻ {e}, nouvel essai dans {delay:.1f}s")
+        finally:
+            limiter.release(ok)
+        if ok:
+            break
+        time.sleep(delay)
+
+    image_data = extract_image_from_response(response)
+    if not image_data:
+        log("❌ Pas d'image dans la réponse")
+        return False
+    raw = base64.b64decode(image_data["data"])
+    cache.put(cache_key(prompt), raw, prompt, image_data["mime_type"], heli=heli["id"])
+    size = save_image(raw, filepath)
+    log(f"✅ Sauvegardé: {filepath.name} ({size:,} octets)")
+    return True
+
+
 def main():
-    if not API_KEY:
-        print("❌ ERREUR: La variable GEMINI_API_KEY n'est pas définie.")
-        print("   Ajoute-la dans ton fichier .env ou exporte-la dans le terminal.")
-        return
-    
+    parser = argparse.ArgumentParser(description="Génère les images d'hélicoptères via l'API Imagen")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requêtes simultanées maximum")
+    parser.add_argument("--retries", type=int, default=5, help="Nouvelles tentatives par image")
+    parser.add_argument("--api-base", default=API_BASE, help="URL de base de l'API (serveur de test local)")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR, help="Dossier de sortie")
+    parser.add_argument("--cache-dir", type=Path, default=CACHE_DIR, help="Cache des images générées")
+    parser.add_argument("--adopt-existing", action="store_true",
+                        help="Enregistre les images existantes comme résultat du prompt actuel")
+    args = parser.parse_args()
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
     print("=" * 60)
     print("Génération des images d'hélicoptères via Gemini API")
-    print(f"Dossier de sortie: {OUTPUT_DIR}")
+    print(f"Dossier de sortie: {args.output_dir}")
     print("=" * 60)
     print()
     
     success = 0
     failed = []
-    
-    for i, heli in enumerate(HELICOPTERS, 1):
-        heli_id = heli["id"]
-        filepath = OUTPUT_DIR / f"{heli_id}.png"
-        
-        # Skip si déjà généré
-        if filepath.exists() and filepath.stat().st_size > 50000:
-            print(f"[{i:02d}/20] ⏩ {heli['name']} - déjà généré, skip")
-            success += 1
-            continue
-        
-        print(f"[{i:02d}/20] 🚁 {heli['name']}...")
+    print_lock = threading.Lock()
+    limiter = AdaptiveLimiter(args.concurrency)
+    cache = GenerationCache(args.cache_dir)
+    total = len(HELICOPTERS)
+    key_reported = False
+
+    def run(i, heli):
+        nonlocal key_reported
+        filepath = args.output_dir / f"{heli['id']}.png"
+
+        def log(message):
+            with print_lock:
+                print(f"[{i:02d}/{total}] {heli['id']:<8} {message}")
+
         prompt = generate_prompt(heli)
-        
-        try:
-            response = call_imagen_api(prompt)
-            image_data = extract_image_from_response(response)
-            
-            if image_data:
-                size = save_image(image_data, filepath)
-                print(f"         ✅ Sauvegardé: {filepath.name} ({size:,} octets)")
-                success += 1
+        key = cache_key(prompt)
+        cached = cache.get(key)
+        if cached is None and args.adopt_existing and filepath.exists():
+            refused = adoptable(filepath)
+            if refused:
+                log(f"⚠️  {filepath.name} non adopté : {refused}, régénération")
             else:
-                print(f"         ❌ Pas d'image dans la réponse")
-                failed.append(heli_id)
-        
-        except urllib.error.HTTPError as e:
-            error_body = e.read().decode() if e.fp else ""
-            print(f"         ❌ Erreur HTTP {e.code}: {error_body[:200]}")
-            failed.append(heli_id)
-        
+                cache.put(key, filepath.read_bytes(), prompt, "image/png", heli=heli["id"], adopted=True)
+                cached = cache.get(key)
+
+        # Même modèle + prompt + config : jamais de nouvel appel à l'API
+        if cached is not None:
+            if filepath.exists() and filepath.read_bytes() == cached:
+                log(f"⏩ {heli['name']} - à jour, skip")
+            else:
+                save_image(cached, filepath)
+                log(f"♻️  {heli['name']} - restauré depuis le cache")
+            return True
+        # La clé n'est requise que pour un vrai appel : le cache suffit sinon
+        if not API_KEY:
+            with print_lock:
+                if not key_reported:
+                    key_reported = True
+                    print("❌ ERREUR: La variable GEMINI_API_KEY n'est pas définie.")
+                    print("   Ajoute-la dans ton fichier .env ou exporte-la dans le terminal.")
+            log(f"❌ {heli['name']} - absent du cache, clé API requise")
+            return False
+        log(f"🚁 {heli['name']}...")
+        try:
+            return generate_one(heli, prompt, filepath, cache, limiter, args, log)
         except Exception as e:
-            print(f"         ❌ Erreur: {e}")
-            failed.append(heli_id)
-        
-        # Pause entre les requêtes pour éviter le rate limiting
-        if i < len(HELICOPTERS):
-            time.sleep(3)
-    
+            log(f"❌ Erreur: {e}")
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(lambda item: run(*item), enumerate(HELICOPTERS, 1)))
+    for heli, ok in zip(HELICOPTERS, outcomes):
+        if ok:
+            success += 1
+        else:
+            failed.append(heli["id"])
+
     print()
     print("=" * 60)
-    print(f"Résultat: {success}/{len(HELICOPTERS)} images générées")
+    print(f"Résultat: {success}/{len(HELICOPTERS)} images générées en {time.perf_counter() - start:.1f}s")
     if failed:
         print(f"Échecs: {', '.join(failed)}")
-    print(f"Dossier: {OUTPUT_DIR}")
+    print(f"Dossier: {args.output_dir}")
     print("=" * 60)
 
 
@@ -0,0 +1,209 @@
+"""Recompress and resize the site images in public/images to size budgets.
+
+Every raster image is kept at its path and format (the site references them
+by name) but is downscaled to its budget's maximum side and re-encoded at
+the highest quality that fits its byte budget (PNGs that do not fit
+losslessly are reduced to a palette). A result is only kept if it is
+smaller than the original; images still over budget are reported.
+
+A state file records the size, mtime and SHA-256 of every image as last
+optimized. An image whose size and mtime still match is skipped without
+being read. If only the mtime changed (fresh checkout), the file is hashed
+and skipped when the content is the same.
+
+Usage:
+  python optimize-images.py [--root public/images] [--state FILE] [--dry-run] [--force]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "public", "images")
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "image-optimize-state.json")
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# (path prefix relative to the root, max side in px, max KB); first match wins
+BUDGETS = [
+    ('aerotools/360/', 1200, 120),
+    ('aerotools/helicopters/', 1200, 180),
+    ('gallery/', 1600, 250),
+    ('', 1920, 300),
+]
+QUALITIES = (85, 80, 75, 70, 65, 60)
+PNG_COLORS = (256, 128, 64)    # palettes tried when a lossless PNG is over budget
+
+
+def budget_for(rel_path):
+    for prefix, max_side, max_kb in BUDGETS:
+        if rel_path.startswith(prefix):
+            return max_side, max_kb * 1024
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(1 << 20):
+            h.update(block)
+    return h.hexdigest()
+
+
+def stat_key(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def encode(img, fmt, max_bytes, **metadata):
+    """Encode at the highest quality that fits max_bytes (or the lowest tried).
+
+    PNG is lossless first, then quantized to a palette of PNG_COLORS.
+    """
+    if fmt == 'PNG':
+        buf = io.BytesIO()
+        img.save(buf, format='PNG', optimize=True, **metadata)
+        if buf.tell() <= max_bytes or img.mode == 'P':
+            return buf.getvalue()
+        alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        rgb = img.convert('RGBA' if alpha else 'RGB')
+        method = Image.Quantize.FASTOCTREE if alpha else Image.Quantize.MEDIANCUT
+        for colors in PNG_COLORS:
+            buf = io.BytesIO()
+            rgb.quantize(colors, method=method).save(buf, format='PNG', optimize=True, **metadata)
+            if buf.tell() <= max_bytes:
+                break
+        return buf.getvalue()
+    for quality in QUALITIES:
+        buf = io.BytesIO()
+        if fmt == 'JPEG':
+            img.save(buf, format='JPEG', quality=quality, optimize=True, progressive=True, **metadata)
+        else:
+            img.save(buf, format='WEBP', quality=quality, method=6, **metadata)
+        if buf.tell() <= max_bytes:
+            break
+    return buf.getvalue()
+
+
+def optimize(job):
+    """Worker: optimize one image in place.
+
+    Returns (rel, before, after, note, error); note is 'resized', 'animated'
+    (left untouched) or None, error the message if the image failed.
+    """
+    path, rel, dry_run = job
+    try:
+        return _optimize(path, rel, dry_run) + (None,)
+    except Exception as e:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        return rel, size, size, None, str(e)
+
+
+def _optimize(path, rel, dry_run):
+    max_side, max_bytes = budget_for(rel)
+    before = os.path.getsize(path)
+    with Image.open(path) as img:
+        if getattr(img, 'is_animated', False):
+            return rel, before, before, 'animated'
+        fmt = img.format
+        # Keep the colour profile (wide-gamut assets) and, for JPEG, the EXIF block
+        metadata = {}
+        if img.info.get('icc_profile'):
+            metadata['icc_profile'] = img.info['icc_profile']
+        img = ImageOps.exif_transpose(img)    # also drops the Orientation tag
+        if fmt == 'JPEG':
+            exif = img.getexif()
+            if exif:
+                metadata['exif'] = exif.tobytes()
+        resized = max(img.size) > max_side
+        if resized:
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+        elif before <= max_bytes:
+            return rel, before, before, None
+        if fmt == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        data = encode(img, fmt, max_bytes, **metadata)
+
+    if len(data) >= before:
+        return rel, before, before, None
+    if not dry_run:
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    return rel, before, len(data), 'resized' if resized else None
+
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize public/images to size budgets")
+    parser.add_argument("--root", default=ROOT, help="Image directory to walk")
+    parser.add_argument("--state", default=STATE_FILE, help="State file (size/mtime/hash per image)")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--dry-run", action="store_true", help="Report savings without writing")
+    parser.add_argument("--force", action="store_true", help="Ignore the state file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    state = {} if args.force else load_state(args.state)
+    new_state, jobs = {}, []
+    for dirpath, _, filenames in os.walk(args.root):
+        for name in sorted(filenames):
+            if not name.lower().endswith(EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, args.root).replace(os.sep, '/')
+            size, mtime_ns = stat_key(path)
+            entry = state.get(rel)
+            if entry and entry['size'] == size:
+                if entry['mtime_ns'] == mtime_ns:
+                    new_state[rel] = entry
+                    continue
+                digest = file_digest(path)
+                if digest == entry['sha256']:
+                    new_state[rel] = dict(entry, mtime_ns=mtime_ns)
+                    continue
+            jobs.append((path, rel, args.dry_run))
+
+    skipped = len(new_state)
+    saved = failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            for (path, rel, _), result in zip(jobs, pool.map(optimize, jobs)):
+                _, before, after, note, error = result
+                if error:
+                    failed += 1
+                    print(f"Failed: {rel} - {error}")
+                    continue
+                saved += before - after
+                if note == 'animated':
+                    print(f"Skipped: {rel} (animated)")
+                elif after < before:
+                    suffix = " (resized)" if note == 'resized' else ""
+                    print(f"Optimized: {rel} {before / 1024:.0f} KB -> {after / 1024:.0f} KB{suffix}")
+                if after > budget_for(rel)[1]:
+                    print(f"Over budget: {rel} {after / 1024:.0f} KB > {budget_for(rel)[1] // 1024} KB")
+                if not args.dry_run:
+                    size, mtime_ns = stat_key(path)
+                    new_state[rel] = {'size': size, 'mtime_ns': mtime_ns, 'sha256': file_digest(path)}
+    finally:
+        # Keep the progress made so far even if the run is interrupted
+        if not args.dry_run:
+            with open(args.state, 'w', encoding='utf-8') as f:
+                json.dump(new_state, f, indent=1, sort_keys=True)
+
+    print(f"\n{len(jobs)} processed, {skipped} unchanged, {failed} failed, {saved / (1024 * 1024):.2f} MB saved "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
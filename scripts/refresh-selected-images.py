@@ -1,20 +1,12 @@
 import os
-import ssl
-import json
-import urllib.request
-import urllib.parse
+import argparse
+
+from wikimedia_fetch import CACHE_FILE, Fetcher, MetadataCache, api_url, download_conditional
 
 # Dossier des images
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_DIR = os.path.join(BASE_DIR, "..", "public", "images", "aerotools", "helicopters")
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-# Contexte SSL tolérant (comme dans les autres scripts)
-ctx = ssl.create_default_context()
-ctx.check_hostname = False
-ctx.verify_mode = ssl.CERT_NONE
-
 # Modèles à rafraîchir avec des requêtes plus précises
 MODELS = [
     {
@@ -39,9 +31,9 @@ AVOID_KEYWORDS = [
 ]
 
 
-def search_wikimedia(query):
+def search_wikimedia(fetcher, query, api=None):
     """Recherche d'images sur Wikimedia Commons pour une requête donnée."""
-    params = urllib.parse.urlencode({
+    data = fetcher.get_json(api_url({
         "action": "query",
         "generator": "search",
         # Recherche plein texte plus large (titre + description)
@@ -49,18 +41,10 @@ def search_wikimedia(query):
         "gsrlimit": "30",
         "gsrnamespace": "6",
         "prop": "imageinfo",
-        "iiprop": "url|size|mime",
+        "iiprop": "url|size|mime|sha1",
         "iiurlwidth": "1200",
         "format": "json",
-    })
-    url = f"https://commons.wikimedia.org/w/api.php?{params}"
-    req = urllib.request.Request(
-        url,
-        headers={"User-Agent": "LledoAerotoolsBot/1.0 (webmaster@mpeb13.com)"},
-    )
-
-    with urllib.request.urlopen(req, context=ctx) as response:
-        data = json.loads(response.read().decode())
+    }, api))
 
     pages = data.get("query", {}).get("pages", {})
     results = []
@@ -87,6 +71,8 @@ def search_wikimedia(query):
                 "title": title,
                 "url": thumb_url,
                 "width": width,
+                # Le hash de l'API est celui de l'original : inutile pour une miniature
+                "sha1": imageinfo.get("sha1") if thumb_url == imageinfo.get("url") else None,
             })
 
     # Plus large d'abord
@@ -94,41 +80,48 @@ def search_wikimedia(query):
     return results
 
 
-def download_image(url, filepath):
-    req = urllib.request.Request(
-        url,
-        headers={"User-Agent": "LledoAerotoolsBot/1.0 (webmaster@mpeb13.com)"},
-    )
-    with urllib.request.urlopen(req, context=ctx) as response:
-        content = response.read()
-    with open(filepath, "wb") as f:
-        f.write(content)
-
-
 def main():
-    print("Rafraîchissement des images h120, gazelle, h225 depuis Wikimedia Commons...")
-    print(f"Dossier de sortie : {OUTPUT_DIR}\n")
-
-    for model in MODELS:
-        mid = model["id"]
-        query = model["query"]
-        filepath = os.path.join(OUTPUT_DIR, f"{mid}.jpg")
-
-        print(f"Recherche pour {mid} : '{query}'")
-        try:
-            results = search_wikimedia(query)
-            if not results:
-                print(f"  ❌ Aucune image valable trouvée pour {mid}")
-                continue
-
-            best = results[0]
-            print(f"  Sélection : {best['title']} ({best['width']}px)")
-            download_image(best["url"], filepath)
-            size = os.path.getsize(filepath)
-            print(f"  ✅ Sauvegardé : {filepath} ({size} octets)\n")
-        except Exception as e:
-            print(f"  ❌ Erreur pour {mid}: {e}\n")
+    parser = argparse.ArgumentParser(description="Rafraîchit quelques images d'hélicoptères depuis Wikimedia Commons")
+    parser.add_argument("--api-url", default=None, help="URL de l'API (serveur de test local)")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Dossier de sortie")
+    parser.add_argument("--cache", default=CACHE_FILE, help="Fichier de cache (ETag, recherches)")
+    parser.add_argument("--search-ttl", type=float, default=168, help="Durée de validité des recherches (heures)")
+    args = parser.parse_args()
+    os.makedirs(args.output_dir, exist_ok=True)
 
+    print("Rafraîchissement des images h120, gazelle, h225 depuis Wikimedia Commons...")
+    print(f"Dossier de sortie : {args.output_dir}\n")
+
+    fetcher = Fetcher()
+    cache = MetadataCache(args.cache)
+    try:
+        for model in MODELS:
+            mid = model["id"]
+            query = model["query"]
+            filepath = os.path.join(args.output_dir, f"{mid}.jpg")
+
+            print(f"Recherche pour {mid} : '{query}'")
+            try:
+                results, cached = cache.search(f"refresh:{query}", args.search_ttl * 3600,
+                                               lambda: search_wikimedia(fetcher, query, args.api_url))
+                if cached:
+                    print("  (recherche en cache)")
+                if not results:
+                    print(f"  ❌ Aucune image valable trouvée pour {mid}")
+                    continue
+
+                best = results[0]
+                print(f"  Sélection : {best['title']} ({best['width']}px)")
+                if not download_conditional(fetcher, cache, best["url"], best["title"], filepath, best.get("sha1")):
+                    print("  ✅ Inchangé (304)\n")
+                    continue
+                size = os.path.getsize(filepath)
+                print(f"  ✅ Sauvegardé : {filepath} ({size} octets)\n")
+            except Exception as e:
+                print(f"  ❌ Erreur pour {mid}: {e}\n")
+    finally:
+        fetcher.close()
+        cache.save()
     print("Terminé.")
 
 
@@ -0,0 +1,247 @@
+"""Render catalogue PDF pages to WebP previews at several zoom levels.
+
+Pages are rendered with pypdfium2 on a pool of worker processes (each opens
+the document once). Every page is fingerprinted first: its decoded content
+streams, size and rotation, plus its resources and annotations resolved
+through every reference (images, soft masks, forms, fonts, appearance
+streams), read with PyMuPDF and hashed by content rather than object
+number. Output files are named after that fingerprint, so when a new
+catalogue is published only the pages whose content changed are rendered
+again, and renders no longer listed in pages.json are deleted.
+
+Usage:
+  python render-pdf-pages.py [catalogue.pdf] [--out-dir DIR] [--zooms 0.5 1 2] [--workers N]
+
+Output (in --out-dir):
+  page-{hash}-{zoom}x.webp   one file per page and zoom (zoom 1 = 72 dpi)
+  pages.json                 {page: {"hash", "renders": [{"zoom", "file", "width", "height"}]}}
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pymupdf  # PyMuPDF
+import pypdfium2 as pdfium
+from PIL import Image
+
+DEFAULT_PDF = r"d:\MPEB\Page 340-349 - Catalogue Solutions Aéronautiques 2026 FR (003).pdf"
+DEFAULT_OUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "public", "images", "catalogue")
+DEFAULT_ZOOMS = [0.5, 1.0, 2.0]
+WEBP_QUALITY = 82
+RENDER_FILE = re.compile(r'page-[0-9a-f]{20}-[\d.]+x\.webp(\.\d+\.tmp)?')
+
+REF = re.compile(r'(\d+) 0 R')
+BACK_LINK = re.compile(r'/(?:Parent|P|Popup|IRT)\s+\d+ 0 R')    # up to the page or page tree
+RESOURCE_NAME = re.compile(rb'/([^\s/\[\]<>(){}%]+)')
+RESOURCE_CATEGORIES = ('ExtGState', 'ColorSpace', 'Pattern', 'Shading', 'XObject', 'Font', 'Properties')
+STREAM_KEYS = re.compile(r'/(?:Length|Filter|DecodeParms)\s*(?:\d+ 0 R|/\w+|\[[^\]]*\]|<<[^>]*>>|\d+)')
+STREAM_LENGTH = re.compile(r'/Length\s*(?:\d+ 0 R|\d+)')
+# Kept encoded: decoding these would cost as much as rendering
+IMAGE_CODECS = {('name', f'/{f}') for f in ('DCTDecode', 'JPXDecode', 'JBIG2Decode', 'CCITTFaxDecode')}
+
+_pdf = None    # the worker's open document
+
+
+class ObjectHasher:
+    """Digest of PDF objects by content, independent of object numbering.
+
+    Every indirect reference in an object's dictionary is replaced by the
+    digest of the object it points to, so the same page in a republished
+    file hashes the same even if all objects were renumbered. Links back to
+    the page tree are ignored, and any other reference back to an object
+    being hashed is replaced by a fixed token. JPEG, JPEG 2000, JBIG2 and CCITT images are
+    hashed by their encoded bytes; every other stream (forms, appearance
+    streams, fonts, soft masks, Flate images) by its decoded bytes, so a
+    different compression of the same content does not matter.
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.digests = {}
+        self.open = {}    # xref -> depth, objects being hashed
+
+    def text(self, source):
+        """Canonical form of a dictionary/array source string."""
+        return self._text(source)[0]
+
+    def _text(self, source):
+        """Canonical form, and the depth of the shallowest open object it refers back to."""
+        low = [len(self.open)]
+
+        def ref(match):
+            digest, depth = self._digest(int(match.group(1)))
+            low[0] = min(low[0], depth)
+            return digest
+
+        return REF.sub(ref, BACK_LINK.sub('', source)), low[0]
+
+    def digest(self, xref):
+        return self._digest(xref)[0]
+
+    def _digest(self, xref):
+        if xref in self.digests:
+            return self.digests[xref], len(self.open)
+        if xref in self.open:
+            # Back-reference: a fixed token, whatever its number
+            return 'cycle', self.open[xref]
+        depth = self.open[xref] = len(self.open)
+        doc = self.doc
+        source = doc.xref_object(xref, compressed=True)
+        h = hashlib.sha256()
+        if doc.xref_is_stream(xref):
+            if doc.xref_get_key(xref, 'Filter') in IMAGE_CODECS:
+                data = doc.xref_stream_raw(xref)
+                source = STREAM_LENGTH.sub('', source)
+            else:
+                data = doc.xref_stream(xref)
+                source = STREAM_KEYS.sub('', source)
+            h.update(data)
+        text, low = self._text(source)
+        h.update(text.encode())
+        del self.open[xref]
+        digest = h.hexdigest()[:32]
+        # Inside a reference cycle a digest depends on where the cycle was
+        # entered: only digests that met no open object are reused
+        if low > depth:
+            self.digests[xref] = digest
+        return digest, low
+
+    def key(self, xref, key):
+        """Canonical form of one dictionary entry (inline or referenced)."""
+        kind, value = self.doc.xref_get_key(xref, key)
+        return '' if kind == 'null' else self.text(value)
+
+
+def _inherited(doc, page, key):
+    """A page attribute that may be inherited from the page tree (Resources)."""
+    xref = page.xref
+    for _ in range(64):
+        if doc.xref_get_key(xref, key)[0] != 'null':
+            return xref
+        kind, parent = doc.xref_get_key(xref, 'Parent')
+        if kind != 'xref':
+            break
+        xref = int(parent.split()[0])
+    return None
+
+
+def page_hashes(pdf_path):
+    """Content fingerprint of every page, from its resolved streams and resources."""
+    hashes = []
+    with pymupdf.open(pdf_path) as doc:
+        hasher = ObjectHasher(doc)
+        for page in doc:
+            h = hashlib.sha256()
+            h.update(repr((tuple(page.rect), page.rotation)).encode())
+            contents = page.read_contents()
+            h.update(contents)
+            # Resource dictionaries are often shared by every page: only hash
+            # the entries this page's content actually names
+            owner = _inherited(doc, page, 'Resources')
+            if owner is not None:
+                names = sorted({name.decode('latin-1') for name in RESOURCE_NAME.findall(contents)})
+                for category in RESOURCE_CATEGORIES:
+                    for name in names:
+                        entry = hasher.key(owner, f'Resources/{category}/{name}')
+                        if entry:
+                            h.update(f'{category}/{name}={entry};'.encode())
+            # Annotations with their appearance streams are drawn too
+            h.update(hasher.key(page.xref, 'Annots').encode())
+            hashes.append(h.hexdigest()[:20])
+    return hashes
+
+
+def render_name(page_hash, zoom):
+    return f"page-{page_hash}-{zoom:g}x.webp"
+
+
+def open_document(pdf_path):
+    """Worker initializer: open the PDF once per process."""
+    global _pdf
+    _pdf = pdfium.PdfDocument(pdf_path)
+
+
+def render_page(job):
+    """Worker: render the missing zoom levels of one page."""
+    page_idx, page_hash, zooms, out_dir = job
+    page = _pdf[page_idx]
+    renders = []
+    for zoom in zooms:
+        image = page.render(scale=zoom).to_pil()
+        name = render_name(page_hash, zoom)
+        tmp = os.path.join(out_dir, f"{name}.{os.getpid()}.tmp")
+        image.save(tmp, format="WEBP", quality=WEBP_QUALITY, method=6)
+        os.replace(tmp, os.path.join(out_dir, name))
+        renders.append((zoom, name, image.size))
+    page.close()
+    return page_idx, renders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render PDF pages to cached WebP previews")
+    parser.add_argument("pdf", nargs="?", default=DEFAULT_PDF, help="Input PDF")
+    parser.add_argument("--out-dir", default=None, help="Output directory (default: public/images/catalogue/<pdf name>)")
+    parser.add_argument("--zooms", type=float, nargs="+", default=DEFAULT_ZOOMS, help="Zoom levels (1 = 72 dpi)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    args = parser.parse_args()
+
+    if args.out_dir is None:
+        args.out_dir = os.path.join(DEFAULT_OUT, os.path.splitext(os.path.basename(args.pdf))[0])
+    os.makedirs(args.out_dir, exist_ok=True)
+    start = time.perf_counter()
+    hashes = page_hashes(args.pdf)
+
+    # Identical pages (blank pages, repeated covers) share their renders
+    pages_by_hash = {}
+    for page_idx, page_hash in enumerate(hashes):
+        pages_by_hash.setdefault(page_hash, []).append(page_idx)
+    jobs = []
+    for page_hash, pages in pages_by_hash.items():
+        missing = [z for z in args.zooms
+                   if not os.path.exists(os.path.join(args.out_dir, render_name(page_hash, z)))]
+        if missing:
+            jobs.append((pages[0], page_hash, missing, args.out_dir))
+    print(f"=== PDF: {len(hashes)} pages, {len(pages_by_hash)} distinct, {len(jobs)} to render "
+          f"at {args.zooms}, {len(pages_by_hash) - len(jobs)} cached ===")
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=open_document,
+                                 initargs=(args.pdf,)) as pool:
+            futures = {pool.submit(render_page, job): job[1] for job in jobs}
+            for future in as_completed(futures):
+                _, renders = future.result()
+                sizes = ", ".join(f"{zoom:g}x {w}x{h}" for zoom, _, (w, h) in renders)
+                pages = ", ".join(str(i + 1) for i in pages_by_hash[futures[future]])
+                print(f"Page {pages}: {sizes}")
+
+    manifest = {}
+    for page_idx, page_hash in enumerate(hashes):
+        renders = []
+        for zoom in args.zooms:
+            name = render_name(page_hash, zoom)
+            with Image.open(os.path.join(args.out_dir, name)) as image:    # header only
+                w, h = image.size
+            renders.append({"zoom": zoom, "file": name, "width": w, "height": h})
+        manifest[str(page_idx + 1)] = {"hash": page_hash, "renders": renders}
+    with open(os.path.join(args.out_dir, "pages.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+
+    # Renders of pages that changed or disappeared are no longer referenced
+    keep = {r["file"] for page in manifest.values() for r in page["renders"]}
+    pruned = 0
+    for name in os.listdir(args.out_dir):
+        if RENDER_FILE.fullmatch(name) and name not in keep:
+            os.remove(os.path.join(args.out_dir, name))
+            pruned += 1
+    if pruned:
+        print(f"Pruned {pruned} stale render(s)")
+
+    print(f"\n[DONE] {len(jobs)} distinct page(s) rendered in {time.perf_counter() - start:.1f}s -> {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Client HTTP partagé par les scripts Wikimedia Commons.
+
+- connexions keep-alive persistantes (http.client), une par thread et par hôte ;
+- limiteur à seau de jetons (token bucket) au lieu de time.sleep fixes ;
+- nouvelles tentatives avec backoff exponentiel + jitter sur erreurs réseau,
+  429 et 5xx, en respectant Retry-After.
+
+Cache de métadonnées (.wikimedia-cache.json) : les résultats de recherche
+sont réutilisés pendant un TTL, et chaque image (clé : chemin résolu) garde
+ETag, Last-Modified, titre et hash du contenu pour des requêtes
+conditionnelles (304 = rien à retélécharger), envoyées seulement si le
+fichier local a toujours ce hash.
+
+Les images sont écrites en flux par blocs dans un fichier .part (mémoire
+constante), reprises par requête Range après une coupure (If-Range protège
+contre un fichier changé entre-temps), vérifiées (taille annoncée, SHA-1 de
+l'API pour les fichiers originaux) puis renommées atomiquement.
+
+L'URL de l'API se surcharge via WIKIMEDIA_API (ou --api-url dans les scripts),
+ce qui permet de tester contre un serveur HTTP local.
+"""
+import hashlib
+import http.client
+import json
+import os
+import random
+import ssl
+import threading
+import time
+import urllib.parse
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".wikimedia-cache.json")
+API_URL = os.environ.get("WIKIMEDIA_API", "https://commons.wikimedia.org/w/api.php")
+USER_AGENT = "LledoAerotoolsBot/1.0 (webmaster@mpeb13.com)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+CHUNK_SIZE = 1 << 16
+
+# Contexte SSL tolérant (comme dans les autres scripts)
+ctx = ssl.create_default_context()
+ctx.check_hostname = False
+ctx.verify_mode = ssl.CERT_NONE
+
+
+class HTTPError(Exception):
+    def __init__(self, status, url):
+        super().__init__(f"HTTP {status} pour {url}")
+        self.status = status
+
+
+class TokenBucket:
+    """`rate` requêtes par seconde en régime permanent, rafales jusqu'à `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(max(burst, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Fetcher:
+    """Requêtes GET avec connexions persistantes, limitation de débit et retries."""
+
+    def __init__(self, rate=4.0, burst=4, retries=4, backoff=1.0, timeout=30):
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.local = threading.local()
+        self.opened = []
+        self.opened_lock = threading.Lock()
+
+    def _connection(self, scheme, netloc):
+        conns = self.local.__dict__.setdefault("conns", {})
+        conn = conns.get((scheme, netloc))
+        if conn is None:
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(netloc, timeout=self.timeout, context=ctx)
+            else:
+                conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            conns[(scheme, netloc)] = conn
+            with self.opened_lock:
+                self.opened.append(conn)
+        return conn
+
+    def _drop(self, scheme, netloc):
+        conn = self.local.__dict__.get("conns", {}).pop((scheme, netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def drop(self, url):
+        """Ferme la connexion de ce thread vers l'hôte de url (réponse non lue en entier)."""
+        parts = urllib.parse.urlsplit(url)
+        self._drop(parts.scheme, parts.netloc)
+
+    def finish(self, url, response):
+        """À appeler une fois le corps lu : libère la connexion si le serveur la ferme."""
+        if response.will_close:
+            self.drop(url)
+
+    def _delay(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def get(self, url, headers=None):
+        """GET url ; renvoie (status, en-têtes, corps). Suit les redirections."""
+        for attempt in range(self.retries + 1):
+            final_url, response = self.open(url, headers)
+            try:
+                body = response.read()
+            except (http.client.HTTPException, OSError):
+                self.drop(final_url)
+                if attempt == self.retries:
+                    raise
+                time.sleep(self._delay(attempt))
+                continue
+            self.finish(final_url, response)
+            return response.status, response.headers, body
+
+    def open(self, url, headers=None):
+        """GET url sans lire le corps ; renvoie (url finale, réponse).
+
+        L'appelant lit le corps puis appelle finish(), ou drop() s'il
+        s'arrête en cours de route.
+        """
+        for _ in range(5):
+            response = self._open_once(url, headers)
+            if response.status not in REDIRECT_STATUSES:
+                return url, response
+            response.read()
+            self.finish(url, response)
+            url = urllib.parse.urljoin(url, response.getheader("Location"))
+        raise HTTPError(response.status, url)
+
+    def _open_once(self, url, headers):
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        send = {"User-Agent": USER_AGENT, "Connection": "keep-alive", **(headers or {})}
+
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            conn = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers=send)
+                response = conn.getresponse()
+                if response.status in RETRY_STATUSES and attempt < self.retries:
+                    response.read()
+                    self.finish(url, response)
+                    time.sleep(self._delay(attempt, response.getheader("Retry-After")))
+                    continue
+            except (http.client.HTTPException, OSError):
+                # Connexion fermée par le serveur ou réseau coupé : on rouvre
+                self._drop(parts.scheme, parts.netloc)
+                if attempt == self.retries:
+                    raise
+                time.sleep(self._delay(attempt))
+                continue
+            return response
+
+    def get_json(self, url):
+        status, _, body = self.get(url)
+        if status != 200:
+            raise HTTPError(status, url)
+        return json.loads(body.decode())
+
+    def close(self):
+        with self.opened_lock:
+            for conn in self.opened:
+                conn.close()
+            self.opened.clear()
+
+
+def api_url(params, base=None):
+    return f"{base or API_URL}?{urllib.parse.urlencode(params)}"
+
+
+class MetadataCache:
+    """Recherches (avec date) et métadonnées des images téléchargées, en JSON."""
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.searches = data.get("searches", {})
+        self.files = data.get("files", {})
+
+    def search(self, key, ttl, run):
+        """Résultats de run(), réutilisés sous `key` s'ils ont moins de `ttl` secondes."""
+        with self.lock:
+            entry = self.searches.get(key)
+        if entry and time.time() - entry["time"] < ttl:
+            return entry["results"], True
+        results = run()
+        with self.lock:
+            self.searches[key] = {"time": time.time(), "results": results}
+        return results, False
+
+    def save(self):
+        with self.lock:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"searches": self.searches, "files": self.files}, f, indent=1, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+
+def file_hash(path, algorithm="sha256"):
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        while block := f.read(CHUNK_SIZE):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_sha256(path):
+    return file_hash(path, "sha256")
+
+
+def _content_range_total(value):
+    """Taille totale de « bytes 0-99/1234 » ; None si inconnue (« /* ») ou illisible."""
+    total = (value or "").rpartition("/")[2].strip()
+    return int(total) if total.isdigit() else None
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def download_conditional(fetcher, cache, url, title, filepath, sha1=None):
+    """Télécharge url vers filepath sauf si le serveur répond 304.
+
+    La requête est conditionnelle (If-None-Match / If-Modified-Since) quand
+    le fichier existe, vient déjà de cette URL et a toujours le hash
+    enregistré ; sinon le GET est inconditionnel. Le corps est écrit par
+    blocs dans filepath.part ; après une coupure (dans ce run ou un
+    précédent) on reprend avec Range + If-Range. Le fichier n'est renommé
+    en place qu'une fois sa taille vérifiée, et son SHA-1 quand l'API le
+    fournit (`sha1`, fichier original seulement). Renvoie True si le
+    fichier a été (re)téléchargé, False s'il est inchangé.
+    """
+    # Clé = chemin résolu : deux dossiers peuvent contenir le même nom de fichier
+    name = os.path.realpath(filepath)
+    with cache.lock:
+        entry = cache.files.get(name)
+    conditional = {}
+    # Un 304 ne vaut que si le fichier local est bien celui qu'on avait téléchargé
+    if (entry and entry.get("url") == url and os.path.exists(filepath)
+            and file_sha256(filepath) == entry.get("sha256")):
+        if entry.get("etag"):
+            conditional["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            conditional["If-Modified-Since"] = entry["last_modified"]
+
+    part, part_meta = filepath + ".part", filepath + ".part.json"
+    for attempt in range(fetcher.retries + 1):
+        meta = _read_json(part_meta)
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = dict(conditional)
+        validator = meta and (meta.get("etag") or meta.get("last_modified"))
+        if offset and meta and meta.get("url") == url and validator:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+
+        final_url, response = fetcher.open(url, headers)
+        if response.status == 304:
+            response.read()
+            fetcher.finish(final_url, response)
+            for leftover in (part, part_meta):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            return False
+        if response.status == 206 and "Range" in headers:
+            mode = "ab"
+            total = _content_range_total(response.getheader("Content-Range"))
+        elif response.status == 200:
+            mode, offset = "wb", 0
+            length = response.getheader("Content-Length")
+            total = int(length) if length else None
+        else:
+            response.read()
+            fetcher.finish(final_url, response)
+            raise HTTPError(response.status, url)
+
+        etag, last_modified = response.getheader("ETag"), response.getheader("Last-Modified")
+        with open(part_meta, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "etag": etag, "last_modified": last_modified}, f)
+        try:
+            with open(part, mode) as f:
+                while chunk := response.read(CHUNK_SIZE):
+                    f.write(chunk)
+        except (http.client.HTTPException, OSError):
+            # Connexion coupée : le .part est gardé, la prochaine tentative reprend avec Range
+            fetcher.drop(final_url)
+            if attempt == fetcher.retries:
+                raise
+            time.sleep(fetcher._delay(attempt))
+            continue
+        fetcher.finish(final_url, response)
+
+        size = os.path.getsize(part)
+        if size == 0 or (total is not None and size != total):
+            if total is not None and size > total:
+                os.remove(part)
+            if attempt == fetcher.retries:
+                raise OSError(f"téléchargement incomplet pour {url} ({size}/{total} octets)")
+            continue
+
+        if sha1 and file_hash(part, "sha1") != sha1.lower():
+            # Contenu corrompu (ou reprise sur un autre fichier) : on repart de zéro
+            os.remove(part)
+            os.remove(part_meta)
+            if attempt == fetcher.retries:
+                raise OSError(f"SHA-1 différent de celui de l'API pour {url}")
+            continue
+
+        digest = file_sha256(part)
+        os.replace(part, filepath)
+        os.remove(part_meta)
+        with cache.lock:
+            cache.files[name] = {
+                "url": url,
+                "title": title,
+                "etag": etag,
+                "last_modified": last_modified,
+                "sha256": digest,
+                "bytes": size,
+            }
+        return True